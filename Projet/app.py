@@ -1,8 +1,10 @@
 import dash
-from dash import dcc, html, Input, Output, State, dash_table
+from dash import dcc, html, Input, Output, State, dash_table, Patch, no_update
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import atexit
 import os
 import time
 from datetime import datetime
@@ -10,26 +12,17 @@ from datetime import datetime
 # Import de vos modules personnalisés
 from recuperation_donnees import load_data_from_websocket
 from transform_data import process_flight_data
-from model import FlightModel
+from model import FlightModel, FlightInferenceSession
+from live_state import LiveState, LiveFeeder, critical_row_key, patch_critical_table
+from transform_data import RESTRICTED_ZONES
+from geofence import ENTRY
+from similarity import build_reference_index, index_flights, flight_embedding, FlightTracker
+from replay import ReplayStore, state_kpis, state_critical_rows, state_positions
 
 # =============================================================================
 # 1. CONSTANTES & CONFIGURATION
 # =============================================================================
 
-# Liste des zones restreintes pour affichage (Format: SW, NW, NE, SE)
-# Copié depuis transform_data pour la visualisation
-RESTRICTED_ZONES = [
-    [(48.5, 2.2), (48.9, 2.2), (48.9, 2.6), (48.5, 2.6)], # Paris
-    [(48.98, 1.15), (49.07, 1.15), (49.07, 1.29), (48.98, 1.29)], # Evreux
-    [(43.87, -0.55), (43.96, -0.55), (43.96, -0.45), (43.87, -0.45)], # Mont-de-Marsan
-    [(48.59, 4.85), (48.68, 4.85), (48.68, 4.95), (48.59, 4.95)], # St-Dizier
-    [(48.54, 5.90), (48.63, 5.90), (48.63, 6.02), (48.54, 6.02)], # Nancy
-    [(47.95, 1.70), (48.04, 1.70), (48.04, 1.82), (47.95, 1.82)], # Orléans
-    [(44.10, 4.80), (44.19, 4.80), (44.19, 4.92), (44.10, 4.92)], # Orange
-    [(44.79, -0.76), (44.87, -0.76), (44.87, -0.66), (44.79, -0.66)], # Bordeaux
-    [(48.75, 2.18), (48.80, 2.18), (48.80, 2.24), (48.75, 2.24)] # Villacoublay
-]
-
 # Chargement du modèle
 print("--- Initialisation du Dashboard ---")
 try:
@@ -44,6 +37,12 @@ except Exception as e:
 # Noms de fichiers
 RAW_FILE = "raw_data.csv"
 TRANSFORMED_FILE = "flight_data_transformed.csv"
+REFERENCE_FILE = "dataset_trajectoires_anomalies.csv"
+# Dossier des snapshots par minute du mode replay (None : historique en mémoire uniquement)
+REPLAY_DIR = "historique_replay"
+
+# Mode live : fréquence de rafraîchissement côté client
+LIVE_INTERVAL_MS = 2000
 
 # =============================================================================
 # 2. LOGIQUE MÉTIER
@@ -61,7 +60,11 @@ def load_and_predict_data():
     if MODEL_LOADED and not df.empty:
         try:
             print("Lancement des prédictions IA...")
-            df['predicted_anomaly'] = ai_pilot.predict(df)
+            # Un libellé stable par vol, calculé sur des fenêtres de points plutôt que point par point
+            flights = ai_pilot.predict_flights(df)
+            print(f"{flights['scored'].sum()} fenêtres scorées pour {len(df)} points ({len(flights)} vols).")
+            df['predicted_anomaly'] = df['flight_id'].map(flights['predicted_anomaly'])
+            df['confidence'] = df['flight_id'].map(flights['confidence'])
         except Exception as e:
             print(f"Erreur prédiction : {e}")
             df['predicted_anomaly'] = "Non calculé"
@@ -72,6 +75,22 @@ def load_and_predict_data():
 
 global_df = load_and_predict_data()
 
+# Historique par minute (snapshots + deltas) pour le mode replay
+replay_history = ReplayStore(directory=REPLAY_DIR)
+# La minute en cours est écrite à l'arrêt, pour ne pas la perdre au redémarrage
+atexit.register(replay_history.flush)
+
+# État versionné servant aux mises à jour différentielles du mode live
+live_state = LiveState(history=replay_history)
+live_state.reset(global_df)
+live_feeder = None
+
+# Index des trajectoires pour la recherche de vols similaires (dataset étiqueté + vols observés)
+print("Indexation des trajectoires...")
+similarity_index = build_reference_index(REFERENCE_FILE)
+index_flights(similarity_index, global_df)
+similarity_tracker = FlightTracker(similarity_index)
+
 # =============================================================================
 # 3. LAYOUT DASH
 # =============================================================================
@@ -96,6 +115,27 @@ def create_card(title, value, id_value, color=colors['text']):
         html.H2(value, id=id_value, style={'color': color, 'fontWeight': 'bold', 'marginTop': '0px', 'fontSize': '28px'})
     ], style={'backgroundColor': colors['card'], 'padding': '15px', 'borderRadius': '8px', 'textAlign': 'center', 'height': '100%'})
 
+def create_critical_table(table_id):
+    return dash_table.DataTable(
+        id=table_id,
+        columns=[
+            {"name": "Flight ID", "id": "flight_id"},
+            {"name": "Callsign", "id": "callsign"},
+            {"name": "Dernière Anomalie", "id": "predicted_anomaly"},
+            {"name": "Zone Restreinte ?", "id": "in_restricted_zone"}, # Ajout visuel
+            {"name": "Vitesse", "id": "ground_speed"},
+            {"name": "Altitude", "id": "altitude"},
+            {"name": "Heure (UTC+0)", "id": "timestamp"}
+        ],
+        style_header={'backgroundColor': '#2c313c', 'color': 'white', 'fontWeight': 'bold', 'border': '1px solid #444'},
+        style_cell={'backgroundColor': '#1a1c23', 'color': 'white', 'border': '1px solid #444', 'textAlign': 'left'},
+        style_data_conditional=[
+            {'if': {'row_index': 'odd'}, 'backgroundColor': '#23262e'},
+            # Mettre en rouge si dans zone restreinte
+            {'if': {'filter_query': '{in_restricted_zone} = 1', 'column_id': 'in_restricted_zone'}, 'color': colors['warning'], 'fontWeight': 'bold'}
+        ]
+    )
+
 app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': colors['text'], 'minHeight': '100vh', 'padding': '20px', 'fontFamily': 'Segoe UI, sans-serif'}, children=[
     
     # --- HEADER ---
@@ -104,6 +144,8 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
         html.Div([
             html.Button("🔄 Màj Données", id='btn-update', n_clicks=0, 
                        style={'backgroundColor': colors['accent'], 'color': 'white', 'border': 'none', 'fontSize': '16px', 'padding': '10px 20px', 'cursor': 'pointer', 'borderRadius': '5px'}),
+            dcc.Checklist(id='live-toggle', options=[{'label': ' Mode Live', 'value': 'live'}], value=[],
+                          style={'marginTop': '5px', 'fontSize': '12px', 'textAlign': 'right'}),
             html.Div(id='last-update-time', style={'marginTop': '5px', 'fontSize': '12px', 'color': '#888', 'textAlign': 'right'})
         ], style={'float': 'right'}),
         html.Div(style={'clear': 'both'})
@@ -111,6 +153,11 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
 
     dcc.Loading(id="loading-data", type="default", children=html.Div(id="loading-output", style={'display': 'none'})),
 
+    # --- MODE LIVE : version connue du client (global / vol affiché) ---
+    dcc.Interval(id='live-interval', interval=LIVE_INTERVAL_MS, disabled=True),
+    dcc.Store(id='live-store'),
+    dcc.Store(id='live-flight-store'),
+
     # --- KPIs GLOBAUX (5 cartes) ---
     html.Div([
         # On utilise un style flexbox ou des largeurs en % pour faire tenir 5 cartes
@@ -125,25 +172,7 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
     # --- SECTION CRITIQUE ---
     html.H4("⚠️ Top 5 : Vols Critiques (IA & Zones)", style={'color': colors['danger'], 'borderLeft': f"5px solid {colors['danger']}", 'paddingLeft': '10px'}),
     html.Div([
-        dash_table.DataTable(
-            id='critical-table',
-            columns=[
-                {"name": "Flight ID", "id": "flight_id"},
-                {"name": "Callsign", "id": "callsign"},
-                {"name": "Dernière Anomalie", "id": "predicted_anomaly"},
-                {"name": "Zone Restreinte ?", "id": "in_restricted_zone"}, # Ajout visuel
-                {"name": "Vitesse", "id": "ground_speed"},
-                {"name": "Altitude", "id": "altitude"},
-                {"name": "Heure (UTC+0)", "id": "timestamp"}
-            ],
-            style_header={'backgroundColor': '#2c313c', 'color': 'white', 'fontWeight': 'bold', 'border': '1px solid #444'},
-            style_cell={'backgroundColor': '#1a1c23', 'color': 'white', 'border': '1px solid #444', 'textAlign': 'left'},
-            style_data_conditional=[
-                {'if': {'row_index': 'odd'}, 'backgroundColor': '#23262e'},
-                # Mettre en rouge si dans zone restreinte
-                {'if': {'filter_query': '{in_restricted_zone} = 1', 'column_id': 'in_restricted_zone'}, 'color': colors['warning'], 'fontWeight': 'bold'}
-            ]
-        )
+        create_critical_table('critical-table')
     ], style={'marginBottom': '40px'}),
 
     # --- ANALYSE DÉTAILLÉE ---
@@ -175,7 +204,20 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
             html.Div([dcc.Graph(id='pie-chart')], className="six columns"),
             html.Div([dcc.Graph(id='box-plot')], className="six columns"),
         ], className="row")
-    ])
+    ]),
+
+    # --- REPLAY HISTORIQUE ---
+    html.Div([
+        html.H4("⏪ Replay : Espace Aérien à un Instant Passé", style={'color': colors['accent'], 'borderLeft': f"5px solid {colors['accent']}", 'paddingLeft': '10px'}),
+        html.Div([
+            dcc.Slider(id='replay-slider', min=0, max=0, step=1, value=None, marks={})
+        ], style={'marginBottom': '20px'}),
+        html.Div(id='replay-kpis', style={'padding': '15px', 'backgroundColor': colors['card'], 'borderRadius': '5px', 'marginBottom': '20px'}),
+        html.Div([
+            html.Div([dcc.Graph(id='replay-map')], className="eight columns"),
+            html.Div([create_critical_table('replay-critical-table')], className="four columns"),
+        ], className="row")
+    ], style={'marginTop': '40px', 'borderTop': '1px solid #444', 'paddingTop': '20px'})
 ])
 
 # =============================================================================
@@ -194,7 +236,8 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
      Output("kpi-last-contact", "children"),
      Output("critical-table", "data"),
      Output("pie-chart", "figure"),
-     Output("box-plot", "figure")],
+     Output("box-plot", "figure"),
+     Output("live-store", "data")],
     [Input("btn-update", "n_clicks")],
     prevent_initial_call=False
 )
@@ -208,17 +251,34 @@ def update_data(n_clicks):
             load_data_from_websocket(nb_messages=5000, output_file=RAW_FILE) # Réduit à 5000 pour rapidité démo
             process_flight_data(input_csv_path=RAW_FILE, output_csv_path=TRANSFORMED_FILE)
             global_df = load_and_predict_data()
+            live_state.reset(global_df)
+            index_flights(similarity_index, global_df)
         except Exception as e:
             print(f"Erreur update : {e}")
-    
+
+    if live_state.moved_past_reset():
+        # Des vols de global_df sont sortis de la fenêtre live : le nouveau client part de l'état live
+        version = live_state.version
+        dropdown_options = live_state.flight_options(until_version=version)
+        default_value = dropdown_options[0]['value'] if dropdown_options else None
+        kpis = live_state.kpis()
+        critical_data = live_state.critical_rows()
+        fig_pie, fig_box = build_sketch_figures(*live_state.stats_summary())
+        live_store = {'version': version, 'kpis': kpis, 'critical': [critical_row_key(row) for row in critical_data]}
+        return ("", time.strftime('%H:%M:%S'), dropdown_options, default_value, *kpis,
+                critical_data, fig_pie, fig_box, live_store)
+
+    # Version de base : les points live déjà reçus seront poussés par push_live_updates
+    live_store = {'version': live_state.base_version, 'kpis': None, 'critical': []}
+
     if global_df.empty:
-        return "", "Jamais", [], None, "0", "0", "0", "0%", "-", [], {}, {}
+        return "", "Jamais", [], None, "0", "0", "0", "0%", "-", [], {}, {}, live_store
 
     unique_flights = global_df.groupby('flight_id').first().reset_index()
     
     # Options Dropdown
     dropdown_options = [
-        {'label': f"{row['callsign']} ({row['flight_id']}) - {row['predicted_anomaly']}", 'value': row['flight_id']}
+        {'label': f"{row['callsign']} ({row['flight_id']})", 'value': row['flight_id']}
         for idx, row in unique_flights.iterrows()
     ]
     default_value = dropdown_options[0]['value'] if dropdown_options else None
@@ -232,12 +292,14 @@ def update_data(n_clicks):
         nb_anomalies = len(unique_flights[unique_flights['predicted_anomaly'] != 'Normal'])
         
     # Vols en zone restreinte (On regarde dans global_df pour ne pas rater un point intermédiaire)
-    # On compte les flight_id uniques qui ont au moins un point à 1
+    # On compte les flight_id uniques qui ont au moins un point à 1,
+    # plus ceux qui ont traversé une zone entre deux messages (détecteur de segments)
+    crossing_ids = live_state.intrusion_flights() & set(unique_flights['flight_id'])
     if 'in_restricted_zone' in global_df.columns:
-        flights_in_zone = global_df[global_df['in_restricted_zone'] == 1]['flight_id'].unique()
-        nb_restricted = len(flights_in_zone)
+        flights_in_zone = set(global_df[global_df['in_restricted_zone'] == 1]['flight_id'].unique())
+        nb_restricted = len(flights_in_zone | crossing_ids)
     else:
-        nb_restricted = 0
+        nb_restricted = len(crossing_ids)
 
     ratio = f"{(nb_anomalies/total_flights*100):.1f}%" if total_flights > 0 else "0%"
     last_contact = global_df['timestamp'].max().strftime('%H:%M:%S') + " UTC+0"
@@ -250,9 +312,13 @@ def update_data(n_clicks):
         crit_ids = unique_flights[unique_flights['predicted_anomaly'] != 'Normal']['flight_id'].tolist()
     
     # On ajoute ceux qui sont dans une zone restreinte
+    zone_ids = []
     if 'in_restricted_zone' in global_df.columns:
         zone_ids = global_df[global_df['in_restricted_zone'] == 1]['flight_id'].unique().tolist()
         crit_ids = list(set(crit_ids + zone_ids)) # Union des deux listes
+    crit_ids = list(set(crit_ids) | crossing_ids)
+    # Passage en zone sur l'ensemble du vol, et non sur son seul dernier point
+    zone_flights = set(zone_ids) | crossing_ids
 
     if crit_ids:
         # On filtre le dataset global pour récupérer les dernières infos de ces vols
@@ -266,7 +332,7 @@ def update_data(n_clicks):
                 "flight_id": row['flight_id'],
                 "callsign": row['callsign'],
                 "predicted_anomaly": row.get('predicted_anomaly', 'N/A'),
-                "in_restricted_zone": row.get('in_restricted_zone', 0),
+                "in_restricted_zone": int(row['flight_id'] in zone_flights),
                 "ground_speed": row['ground_speed'],
                 "altitude": row['altitude'],
                 "timestamp": row['timestamp'].strftime('%H:%M:%S')
@@ -281,41 +347,93 @@ def update_data(n_clicks):
     fig_box = px.box(global_df, x='predicted_anomaly', y='altitude', title="Altitude vs IA", color='predicted_anomaly')
     fig_box.update_layout(paper_bgcolor=colors['card'], font_color='white', plot_bgcolor=colors['card'])
 
-    return "", time.strftime('%H:%M:%S'), dropdown_options, default_value, str(total_flights), str(nb_anomalies), str(nb_restricted), ratio, last_contact, critical_data, fig_pie, fig_box
+    live_store['kpis'] = [str(total_flights), str(nb_anomalies), str(nb_restricted), ratio, last_contact]
+    live_store['critical'] = [critical_row_key(row) for row in critical_data]
+
+    return "", time.strftime('%H:%M:%S'), dropdown_options, default_value, str(total_flights), str(nb_anomalies), str(nb_restricted), ratio, last_contact, critical_data, fig_pie, fig_box, live_store
+
+def add_restricted_zones(fig_map):
+    """Ajoute les zones restreintes (rectangles rouges) et le style sombre à une carte."""
+    # On utilise go.Scattermapbox avec mode 'lines' et fill 'toself' pour faire des polygones
+    for zone_name, zone in RESTRICTED_ZONES.items():
+        # zone = [(lat, lon), (lat, lon), ...]
+        # Pour fermer le polygone, il faut répéter le premier point à la fin si ce n'est pas fait
+        lats = [p[0] for p in zone] + [zone[0][0]]
+        lons = [p[1] for p in zone] + [zone[0][1]]
+        
+        fig_map.add_trace(go.Scattermapbox(
+            mode="lines",
+            lon=lons, lat=lats,
+            fill='toself',
+            fillcolor='rgba(231, 76, 60, 0.3)', # Rouge semi-transparent
+            line=dict(width=1, color='#e74c3c'),
+            name="Zone Restreinte",
+            hoverinfo='text',
+            text=f'ZONE INTERDITE : {zone_name}'
+        ))
+
+    fig_map.update_layout(mapbox_style="carto-darkmatter", margin={"r":0,"t":0,"l":0,"b":0}, paper_bgcolor=colors['card'])
+    # Légende inutilement verbeuse sur la carte, on peut la cacher
+    fig_map.update_layout(showlegend=False)
 
 @app.callback(
     [Output("flight-details-panel", "children"),
      Output("map-graph", "figure"),
      Output("deviation-graph", "figure"),
      Output("altitude-graph", "figure"),
-     Output("speed-graph", "figure")],
+     Output("speed-graph", "figure"),
+     Output("live-flight-store", "data")],
     [Input("flight-dropdown", "value")]
 )
 def update_flight_details(selected_flight_id):
-    if not selected_flight_id or global_df.empty:
-        return "Sélectionnez un vol", {}, {}, {}, {}
+    # En mode live, les points reçus depuis le dernier chargement sont inclus
+    version, df = live_state.snapshot()
+    flight_store = {'flight_id': selected_flight_id, 'version': version}
+
+    if not selected_flight_id or df.empty:
+        return "Sélectionnez un vol", {}, {}, {}, {}, flight_store
 
-    dff = global_df[global_df['flight_id'] == selected_flight_id].sort_values('timestamp')
-    if dff.empty: return "Pas de données", {}, {}, {}, {}
+    dff = df[df['flight_id'] == selected_flight_id].sort_values('timestamp')
+    if dff.empty: return "Pas de données", {}, {}, {}, {}, flight_store
 
-    # Info Panel
-    main_status = dff['predicted_anomaly'].mode()[0] if 'predicted_anomaly' in dff.columns else "Inconnu"
+    # Info Panel : libellé actuel du vol (inférence par fenêtres), tel que suivi par l'état live
+    status = live_state.flight_status(selected_flight_id) or {}
+    main_status = status.get('predicted_anomaly', "Inconnu")
+    zone_events = live_state.flight_zone_events(selected_flight_id)
     in_zone = 1 in dff['in_restricted_zone'].values if 'in_restricted_zone' in dff.columns else False
+    in_zone = in_zone or bool(zone_events)
     
     status_color = colors['success'] if main_status == 'Normal' else colors['danger']
+    confidence = status.get('confidence')
+    confidence_msg = f"(confiance {confidence:.0%})" if confidence is not None and not pd.isna(confidence) else ""
     zone_msg = "⚠️ A TRAVERSÉ UNE ZONE RESTREINTE" if in_zone else "✅ Trajet Autorisé"
     zone_color = colors['warning'] if in_zone else colors['success']
 
+    # Vols au comportement proche (dataset de référence et vols déjà observés)
+    similar_flights = similarity_index.query(flight_embedding(dff), k=5, exclude=selected_flight_id)
+
     info_panel = html.Div([
         html.Div([
             html.Span("Statut IA : ", style={'fontWeight': 'bold'}),
-            html.Span(main_status.upper(), style={'color': status_color, 'fontWeight': 'bold', 'marginLeft': '10px', 'marginRight': '20px'}),
+            html.Span(main_status.upper(), style={'color': status_color, 'fontWeight': 'bold', 'marginLeft': '10px'}),
+            html.Span(confidence_msg, style={'color': '#aaa', 'marginLeft': '5px', 'marginRight': '20px'}),
             html.Span("Zones : ", style={'fontWeight': 'bold'}),
             html.Span(zone_msg, style={'color': zone_color, 'fontWeight': 'bold', 'marginLeft': '10px'})
         ]),
         html.Div([
             f"Début: {dff['timestamp'].iloc[0].strftime('%H:%M:%S')} | Fin: {dff['timestamp'].iloc[-1].strftime('%H:%M:%S')}"
-        ], style={'marginTop': '10px', 'color': '#aaa'})
+        ], style={'marginTop': '10px', 'color': '#aaa'}),
+        html.Div([
+            html.Div(f"{'Entrée' if e.event == ENTRY else 'Sortie'} {e.zone} à {e.timestamp.strftime('%H:%M:%S')} (interpolé)")
+            for e in zone_events
+        ], style={'marginTop': '10px', 'color': colors['warning']}),
+        html.Div([
+            html.Span("Vols similaires : ", style={'fontWeight': 'bold'}),
+            html.Ul([
+                html.Li(f"{fid} - {label} (distance {distance:.2f})")
+                for fid, label, distance in similar_flights
+            ] or [html.Li("Aucun")], style={'marginBottom': '0px'})
+        ], style={'marginTop': '10px'})
     ])
 
     # CARTE AVEC ZONES RESTREINTES
@@ -325,29 +443,14 @@ def update_flight_details(selected_flight_id):
         hover_data=["ground_speed", "heading", "in_restricted_zone"],
         zoom=5, height=450
     )
+    # Tableaux en listes pour pouvoir les prolonger par Patch en mode live
+    fig_map.data[0].lat = dff['latitude'].tolist()
+    fig_map.data[0].lon = dff['longitude'].tolist()
+    fig_map.data[0].marker.color = dff['altitude'].tolist()
+    fig_map.data[0].customdata = dff[["ground_speed", "heading", "in_restricted_zone"]].values.tolist()
     
     # 2. Ajout des zones restreintes (Rectangles Rouges)
-    # On utilise go.Scattermapbox avec mode 'lines' et fill 'toself' pour faire des polygones
-    for zone in RESTRICTED_ZONES:
-        # zone = [(lat, lon), (lat, lon), ...]
-        # Pour fermer le polygone, il faut répéter le premier point à la fin si ce n'est pas fait
-        lats = [p[0] for p in zone] + [zone[0][0]]
-        lons = [p[1] for p in zone] + [zone[0][1]]
-        
-        fig_map.add_trace(go.Scattermapbox(
-            mode="lines",
-            lon=lons, lat=lats,
-            fill='toself',
-            fillcolor='rgba(231, 76, 60, 0.3)', # Rouge semi-transparent
-            line=dict(width=1, color='#e74c3c'),
-            name="Zone Restreinte",
-            hoverinfo='text',
-            text='ZONE INTERDITE'
-        ))
-
-    fig_map.update_layout(mapbox_style="carto-darkmatter", margin={"r":0,"t":0,"l":0,"b":0}, paper_bgcolor=colors['card'])
-    # Légende inutilement verbeuse sur la carte, on peut la cacher
-    fig_map.update_layout(showlegend=False)
+    add_restricted_zones(fig_map)
 
     # Autres graphiques
     fig_dev = px.area(dff, x='timestamp', y='deviation_m', title="Déviation (m)")
@@ -361,7 +464,197 @@ def update_flight_details(selected_flight_id):
     fig_speed.update_layout(paper_bgcolor=colors['card'], font_color='white', plot_bgcolor=colors['card'])
     fig_speed.update_traces(line_color=colors['warning'])
 
-    return info_panel, fig_map, fig_dev, fig_alt, fig_speed
+    timestamps = dff['timestamp'].tolist()
+    for fig, col in [(fig_dev, 'deviation_m'), (fig_alt, 'altitude'), (fig_speed, 'ground_speed')]:
+        fig.data[0].x = timestamps
+        fig.data[0].y = dff[col].tolist()
+
+    return info_panel, fig_map, fig_dev, fig_alt, fig_speed, flight_store
+
+@app.callback(
+    Output("live-interval", "disabled"),
+    [Input("live-toggle", "value")]
+)
+def toggle_live_mode(live_value):
+    global live_feeder
+    enabled = 'live' in (live_value or [])
+
+    if enabled and (live_feeder is None or not live_feeder.is_alive()):
+        # Inférence par vol : seules les fenêtres qui reçoivent de nouveaux points sont rescorées
+        predict_fn = FlightInferenceSession(ai_pilot).update if MODEL_LOADED else None
+        live_feeder = LiveFeeder(live_state, predict_fn=predict_fn,
+                                 on_chunk=similarity_tracker.update)
+        live_feeder.start()
+    elif not enabled and live_feeder is not None:
+        live_feeder.stop()
+        live_feeder = None
+
+    return not enabled
+
+def patch_flight_figures(points):
+    """Patches qui ajoutent les nouveaux points du vol affiché aux traces existantes."""
+    timestamps = [ts.isoformat() for ts in points['timestamp']]
+
+    map_patch = Patch()
+    map_patch['data'][0]['lat'].extend(points['latitude'].tolist())
+    map_patch['data'][0]['lon'].extend(points['longitude'].tolist())
+    map_patch['data'][0]['marker']['color'].extend(points['altitude'].tolist())
+    map_patch['data'][0]['customdata'].extend(points[["ground_speed", "heading", "in_restricted_zone"]].values.tolist())
+
+    line_patches = []
+    for col in ['deviation_m', 'altitude', 'ground_speed']:
+        line_patch = Patch()
+        line_patch['data'][0]['x'].extend(timestamps)
+        line_patch['data'][0]['y'].extend(points[col].tolist())
+        line_patches.append(line_patch)
+
+    return [map_patch] + line_patches
+
+def build_sketch_figures(flights_by_label, altitude_stats):
+    """Camembert (vols de la fenêtre live) et box plot précalculé à partir des sketches (taille fixe)."""
+    status_counts = pd.DataFrame(list(flights_by_label.items()), columns=['Status', 'Count'])
+    fig_pie = px.pie(status_counts, values='Count', names='Status', title="Répartition IA", color_discrete_sequence=px.colors.qualitative.Pastel)
+    fig_pie.update_layout(paper_bgcolor=colors['card'], font_color='white')
+
+    # Box plot précalculé : min / q1 / médiane / q3 / max par type d'anomalie
+    fig_box = go.Figure()
+    for label, (q_min, q1, median, q3, q_max) in altitude_stats.items():
+        fig_box.add_trace(go.Box(x=[label], q1=[q1], median=[median], q3=[q3],
+                                 lowerfence=[q_min], upperfence=[q_max], name=label))
+    fig_box.update_layout(title="Altitude vs IA", paper_bgcolor=colors['card'], font_color='white', plot_bgcolor=colors['card'])
+
+    return fig_pie, fig_box
+
+@app.callback(
+    [Output("last-update-time", "children", allow_duplicate=True),
+     Output("flight-dropdown", "options", allow_duplicate=True),
+     Output("kpi-total-flights", "children", allow_duplicate=True),
+     Output("kpi-anomalies", "children", allow_duplicate=True),
+     Output("kpi-restricted", "children", allow_duplicate=True),
+     Output("kpi-ratio", "children", allow_duplicate=True),
+     Output("kpi-last-contact", "children", allow_duplicate=True),
+     Output("critical-table", "data", allow_duplicate=True),
+     Output("pie-chart", "figure", allow_duplicate=True),
+     Output("box-plot", "figure", allow_duplicate=True),
+     Output("map-graph", "figure", allow_duplicate=True),
+     Output("deviation-graph", "figure", allow_duplicate=True),
+     Output("altitude-graph", "figure", allow_duplicate=True),
+     Output("speed-graph", "figure", allow_duplicate=True),
+     Output("live-store", "data", allow_duplicate=True),
+     Output("live-flight-store", "data", allow_duplicate=True)],
+    [Input("live-interval", "n_intervals")],
+    [State("live-store", "data"),
+     State("live-flight-store", "data")],
+    prevent_initial_call=True
+)
+def push_live_updates(n_intervals, live_store, flight_store):
+    """
+    Mode live : n'envoie au navigateur que ce qui a changé depuis la version du client
+    (nouveaux points du vol affiché, KPIs modifiés, lignes critiques entrantes/sortantes).
+    """
+    if not live_store:
+        raise PreventUpdate
+
+    version = live_state.version
+    client_version = live_store.get('version')
+    flight_id = (flight_store or {}).get('flight_id')
+    flight_version = (flight_store or {}).get('version')
+
+    if client_version == version and flight_version == version:
+        raise PreventUpdate
+
+    stale = live_state.is_stale(client_version)
+
+    # Dropdown : ajout des seuls nouveaux vols
+    if stale:
+        options = live_state.flight_options(until_version=version)
+    else:
+        new_options = live_state.flight_options(since_version=client_version, until_version=version)
+        options = no_update
+        if new_options:
+            options = Patch()
+            options.extend(new_options)
+
+    # KPIs : seules les cartes dont la valeur a changé sont renvoyées
+    kpis = live_state.kpis()
+    old_kpis = None if stale else live_store.get('kpis')
+    kpi_outputs = [value if old_kpis is None or old_kpis[i] != value else no_update
+                   for i, value in enumerate(kpis)]
+
+    # Tableau critique
+    critical_rows = live_state.critical_rows()
+    critical = critical_rows if stale else patch_critical_table(live_store.get('critical') or [], critical_rows)
+
+    # Statistiques globales : figures de taille fixe, renvoyées seulement si de nouvelles données sont arrivées
+    fig_pie, fig_box = no_update, no_update
+    if stale or client_version != version:
+        fig_pie, fig_box = build_sketch_figures(*live_state.stats_summary())
+
+    # Vol affiché : ajout des nouveaux points aux traces
+    figures = [no_update] * 4
+    new_flight_store = {'flight_id': flight_id, 'version': version}
+    if flight_id:
+        if live_state.is_stale(flight_version):
+            details = update_flight_details(flight_id)
+            figures = list(details[1:5])
+            new_flight_store = details[5]
+        else:
+            points = live_state.flight_points_since(flight_id, flight_version, until_version=version)
+            if points is not None:
+                figures = patch_flight_figures(points)
+
+    new_store = {'version': version, 'kpis': kpis, 'critical': [critical_row_key(row) for row in critical_rows]}
+
+    return ["🟢 Live " + time.strftime('%H:%M:%S'), options] + kpi_outputs + [critical, fig_pie, fig_box] + figures + [new_store, new_flight_store]
+
+@app.callback(
+    [Output("replay-slider", "min"),
+     Output("replay-slider", "max"),
+     Output("replay-slider", "marks")],
+    [Input("live-store", "data")]
+)
+def update_replay_range(live_store):
+    """Étend le curseur du replay à mesure que l'historique grandit."""
+    time_range = replay_history.time_range()
+    if time_range is None:
+        return 0, 0, {}
+
+    first, last = time_range
+    step = max(1, (last - first) // 6)
+    marks = {m: replay_history.minute_start(m).strftime('%H:%M') for m in range(first, last + 1, step)}
+    return first, last, marks
+
+@app.callback(
+    [Output("replay-map", "figure"),
+     Output("replay-kpis", "children"),
+     Output("replay-critical-table", "data")],
+    [Input("replay-slider", "value")]
+)
+def update_replay(minute_id):
+    """Espace aérien, KPIs et vols critiques à la fin de la minute choisie (un snapshot + une minute de deltas)."""
+    if minute_id is None:
+        return {}, "Choisissez un instant sur le curseur", []
+
+    moment = replay_history.minute_start(minute_id + 1) - pd.Timedelta(microseconds=1)
+    state = replay_history.seek(moment)
+    if not state:
+        return {}, f"Aucun avion actif à {moment.strftime('%H:%M')} UTC+0", []
+
+    positions = state_positions(state)
+    fig_map = px.scatter_mapbox(
+        positions, lat="latitude", lon="longitude", color="predicted_anomaly",
+        hover_name="callsign", hover_data=["altitude", "ground_speed"],
+        zoom=5, height=450
+    )
+    add_restricted_zones(fig_map)
+
+    total, anomalies, restricted, ratio, last_contact = state_kpis(state)
+    kpi_text = html.Div([
+        html.Span(f"Instant : {moment.strftime('%Y-%m-%d %H:%M')} UTC+0", style={'fontWeight': 'bold', 'marginRight': '20px'}),
+        f"Vols actifs : {total} | Alertes IA : {anomalies} | Intrusions Zones : {restricted} | Taux Anomalie : {ratio} | Dernier Contact : {last_contact}"
+    ])
+
+    return fig_map, kpi_text, state_critical_rows(state)
 
 if __name__ == '__main__':
     app.run(host="127.0.0.1", port=8050, debug=True)
@@ -0,0 +1,168 @@
+"""
+Traitement par lots, sans dashboard, d'un dossier de captures ADS-B :
+lecture des messages -> transformation -> prédiction IA, un CSV de sortie par capture.
+
+Exemple (retraitement nocturne) :
+    python batch_cli.py ../TP1 --pattern "adsb_data_*.csv" --output-dir batch_output --workers 4
+
+Un fichier checkpoint.json dans le dossier de sortie mémorise les captures déjà traitées
+(taille + date de modification) : une exécution interrompue reprend là où elle s'était arrêtée.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from recuperation_donnees import read_capture
+from transform_data import transform_raw_data
+from model import FlightModel
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Modèle chargé une seule fois par processus worker
+_worker_model = None
+
+
+def _get_model(model_folder):
+    global _worker_model
+    if _worker_model is None:
+        _worker_model = FlightModel(model_folder=model_folder)
+        _worker_model.load_model()
+    return _worker_model
+
+
+def output_path_for(capture_path, output_dir):
+    stem = os.path.splitext(os.path.basename(capture_path))[0]
+    return os.path.join(output_dir, f"{stem}_transformed.csv")
+
+
+def process_capture(capture_path, output_dir, model_folder="models", predict=True):
+    """
+    Traite une capture complète et écrit son CSV transformé (écriture atomique).
+    :return: dictionnaire de statistiques pour le checkpoint et le résumé.
+    """
+    start = time.time()
+    df_raw = read_capture(capture_path)
+    df = transform_raw_data(df_raw, verbose=False)
+
+    rows_out = 0
+    flights = 0
+    output_path = output_path_for(capture_path, output_dir)
+    if df is not None:
+        if predict:
+            # Un libellé par vol, calculé sur des fenêtres de points
+            flight_labels = _get_model(model_folder).predict_flights(df)
+            df["predicted_anomaly"] = df["flight_id"].map(flight_labels["predicted_anomaly"])
+            df["confidence"] = df["flight_id"].map(flight_labels["confidence"])
+        rows_out = len(df)
+        flights = df["flight_id"].nunique()
+        tmp_path = output_path + ".tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, output_path)
+
+    return {
+        "output": os.path.abspath(output_path) if df is not None else None,
+        "messages": len(df_raw),
+        "rows_out": rows_out,
+        "flights": flights,
+        "seconds": round(time.time() - start, 3),
+    }
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def is_done(checkpoint, path):
+    """Vrai si la capture a déjà été traitée dans son état actuel."""
+    entry = checkpoint.get(os.path.abspath(path))
+    if entry is None or {"size": entry["size"], "mtime": entry["mtime"]} != file_signature(path):
+        return False
+    return entry["output"] is None or os.path.exists(entry["output"])
+
+
+def run_batch(input_dir, pattern="*.csv", output_dir="batch_output", workers=None, model_folder="models", predict=True):
+    """Traite toutes les captures du dossier et affiche un résumé de débit. Retourne le nombre d'échecs."""
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    captures = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    todo = [path for path in captures if not is_done(checkpoint, path)]
+    skipped = len(captures) - len(todo)
+
+    print(f"--- Traitement par lots ---")
+    print(f"Captures trouvées : {len(captures)} | Déjà traitées : {skipped} | À traiter : {len(todo)}")
+
+    start = time.time()
+    total_messages = 0
+    total_rows = 0
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_capture, path, output_dir, model_folder, predict): path
+            for path in todo
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"❌ {os.path.basename(path)} : {e}")
+                continue
+
+            total_messages += stats["messages"]
+            total_rows += stats["rows_out"]
+            rate = stats["messages"] / stats["seconds"] if stats["seconds"] > 0 else 0
+            print(f"✅ {os.path.basename(path)} : {stats['messages']} messages, {stats['flights']} vols, "
+                  f"{stats['seconds']:.1f}s ({rate:.0f} msg/s)")
+
+            # Checkpoint après chaque capture terminée
+            checkpoint[os.path.abspath(path)] = {**file_signature(path), **stats}
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    elapsed = time.time() - start
+    throughput = total_messages / elapsed if elapsed > 0 else 0
+    print(f"\n--- Résumé ---")
+    print(f"Captures traitées : {len(todo) - failures} | Ignorées (checkpoint) : {skipped} | Échecs : {failures}")
+    print(f"Messages lus : {total_messages} | Points exportés : {total_rows}")
+    print(f"Durée : {elapsed:.1f}s | Débit : {throughput:.0f} messages/s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Traitement par lots des captures ADS-B (sans dashboard).")
+    parser.add_argument("input_dir", help="Dossier contenant les captures")
+    parser.add_argument("--pattern", default="*.csv", help="Motif des fichiers à traiter (ex : 'adsb_data_*.csv')")
+    parser.add_argument("--output-dir", default="batch_output", help="Dossier des CSV transformés et du checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut : nombre de CPU)")
+    parser.add_argument("--model-folder", default="models", help="Dossier du modèle Random Forest")
+    parser.add_argument("--no-predict", action="store_true", help="Ne pas lancer les prédictions IA")
+    args = parser.parse_args()
+
+    failures = run_batch(args.input_dir, pattern=args.pattern, output_dir=args.output_dir,
+                         workers=args.workers, model_folder=args.model_folder, predict=not args.no_predict)
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import math
+from collections import defaultdict, namedtuple
+
+import pandas as pd
+
+from transform_data import RESTRICTED_ZONES
+
+# Événement émis lorsqu'un avion entre dans une zone restreinte ou en sort
+GeofenceEvent = namedtuple("GeofenceEvent", ["flight_id", "zone", "event", "timestamp", "latitude", "longitude"])
+
+ENTRY = "entry"
+EXIT = "exit"
+
+
+def clip_segment(lat0, lon0, lat1, lon1, box):
+    """
+    Intersection d'un segment avec un rectangle (algorithme de Liang-Barsky).
+    :param box: (lat_min, lat_max, lon_min, lon_max)
+    :return: (t_entrée, t_sortie) en fraction du segment [0, 1], ou None si pas d'intersection.
+    """
+    lat_min, lat_max, lon_min, lon_max = box
+    d_lat = lat1 - lat0
+    d_lon = lon1 - lon0
+    t0, t1 = 0.0, 1.0
+
+    for p, q in ((-d_lat, lat0 - lat_min), (d_lat, lat_max - lat0),
+                 (-d_lon, lon0 - lon_min), (d_lon, lon_max - lon0)):
+        if p == 0:
+            # Segment parallèle à ce bord : entièrement dehors ou sans contrainte
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+
+    return t0, t1
+
+
+class GeofenceEngine:
+    """
+    Détecteur d'entrées/sorties de zones restreintes en flux.
+    Chaque nouvelle position est comparée à la précédente du même avion : le segment
+    entre les deux est intersecté avec les zones, ce qui détecte les traversées
+    complètes entre deux messages ADS-B espacés (ex : zone de Villacoublay, ~5 km).
+    Les zones sont indexées dans une grille de cell_deg degrés pour ne tester que les
+    zones proches du segment.
+    """
+
+    def __init__(self, zones=RESTRICTED_ZONES, cell_deg=1.0, max_gap_s=600):
+        self.cell_deg = cell_deg
+        # Au-delà de cet écart entre deux messages, on ne suppose plus de trajectoire rectiligne
+        self.max_gap_s = max_gap_s
+        self.zones = []
+        self.grid = defaultdict(list)
+        for name, corners in zones.items():
+            # Même convention que in_restricted : [SW, NW, NE, SE]
+            box = (corners[0][0], corners[1][0], corners[0][1], corners[2][1])
+            idx = len(self.zones)
+            self.zones.append((name, box))
+            for cell in self._cells(box[0], box[1], box[2], box[3]):
+                self.grid[cell].append(idx)
+
+        self.last_position = {}
+        self.inside = {}
+
+    def _cells(self, lat_min, lat_max, lon_min, lon_max):
+        for i in range(math.floor(lat_min / self.cell_deg), math.floor(lat_max / self.cell_deg) + 1):
+            for j in range(math.floor(lon_min / self.cell_deg), math.floor(lon_max / self.cell_deg) + 1):
+                yield (i, j)
+
+    def _candidates(self, lat0, lon0, lat1, lon1):
+        found = set()
+        for cell in self._cells(min(lat0, lat1), max(lat0, lat1), min(lon0, lon1), max(lon0, lon1)):
+            found.update(self.grid.get(cell, ()))
+        return found
+
+    @staticmethod
+    def _contains(box, lat, lon):
+        return box[0] <= lat <= box[1] and box[2] <= lon <= box[3]
+
+    def update(self, flight_id, lat, lon, timestamp):
+        """
+        Traite une nouvelle position et retourne la liste des GeofenceEvent déclenchés,
+        avec l'heure et la position interpolées au franchissement du bord de la zone.
+        """
+        previous = self.last_position.get(flight_id)
+        inside = self.inside.get(flight_id, set())
+        self.last_position[flight_id] = (lat, lon, timestamp)
+
+        events = []
+        gap_ok = previous is not None and 0 <= (timestamp - previous[2]).total_seconds() <= self.max_gap_s
+
+        if not gap_ok:
+            # Premier point (ou trou trop long) : simple test d'appartenance
+            now_inside = {idx for idx in self._candidates(lat, lon, lat, lon)
+                          if self._contains(self.zones[idx][1], lat, lon)}
+            for idx in sorted(now_inside - inside):
+                events.append(GeofenceEvent(flight_id, self.zones[idx][0], ENTRY, timestamp, lat, lon))
+            for idx in sorted(inside - now_inside):
+                events.append(GeofenceEvent(flight_id, self.zones[idx][0], EXIT, timestamp, lat, lon))
+            self.inside[flight_id] = now_inside
+            return events
+
+        lat0, lon0, ts0 = previous
+        duration = timestamp - ts0
+        now_inside = set()
+
+        for idx in self._candidates(lat0, lon0, lat, lon) | inside:
+            name, box = self.zones[idx]
+            clip = clip_segment(lat0, lon0, lat, lon, box)
+            was_inside = idx in inside
+
+            if clip is None:
+                if was_inside:
+                    events.append(GeofenceEvent(flight_id, name, EXIT, ts0, lat0, lon0))
+                continue
+
+            t_in, t_out = clip
+            if not was_inside:
+                events.append(GeofenceEvent(flight_id, name, ENTRY, ts0 + duration * t_in,
+                                            lat0 + (lat - lat0) * t_in, lon0 + (lon - lon0) * t_in))
+            if self._contains(box, lat, lon):
+                now_inside.add(idx)
+            else:
+                events.append(GeofenceEvent(flight_id, name, EXIT, ts0 + duration * t_out,
+                                            lat0 + (lat - lat0) * t_out, lon0 + (lon - lon0) * t_out))
+
+        self.inside[flight_id] = now_inside
+        events.sort(key=lambda e: e.timestamp)
+        return events
+
+    def expire(self, older_than):
+        """Oublie les avions dont le dernier message est antérieur à older_than."""
+        for flight_id in [fid for fid, pos in self.last_position.items() if pos[2] < older_than]:
+            del self.last_position[flight_id]
+            self.inside.pop(flight_id, None)
+
+
+def detect_zone_events(df, engine=None):
+    """
+    Rejoue un DataFrame transformé (flight_id, latitude, longitude, timestamp) dans un GeofenceEngine,
+    par ordre chronologique, et retourne les événements sous forme de DataFrame.
+    """
+    engine = engine or GeofenceEngine()
+    events = []
+    if not df.empty:
+        ordered = df.sort_values("timestamp")
+        for row in ordered[["flight_id", "latitude", "longitude", "timestamp"]].itertuples(index=False):
+            events.extend(engine.update(row.flight_id, row.latitude, row.longitude, row.timestamp))
+    return pd.DataFrame(events, columns=GeofenceEvent._fields)
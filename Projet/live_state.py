@@ -0,0 +1,387 @@
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+from dash import Patch, no_update
+
+from geofence import GeofenceEngine, detect_zone_events
+from recuperation_donnees import SBS_COLUMNS, stream_messages_from_websocket
+from sketches import StreamingStats
+from transform_data import compute_deviation, decode_polyline, generate_polyline, transform_raw_data
+
+# Colonnes propagées d'un message à l'autre pour un même avion (MSG 1/3/4 sont complémentaires)
+MEMORY_COLUMNS = ["Callsign", "Altitude", "GroundSpeed", "Track"]
+
+
+class LiveState:
+    """
+    État versionné du dashboard en mode live.
+    Chaque lot ingéré incrémente la version ; le client garde la dernière version reçue
+    et ne se voit renvoyer que ce qui a changé depuis (points, KPIs, vols critiques).
+
+    L'état couvre une fenêtre glissante de window_s secondes : toutes les expire_every_s secondes
+    (horodatage des messages), les vols sans message dans la fenêtre et leurs points sont oubliés.
+    Le client est alors resynchronisé entièrement (base_version), pour retirer ces vols du dropdown.
+    """
+
+    def __init__(self, max_journal=500, history=None, window_s=3600, expire_every_s=300):
+        self.lock = threading.Lock()
+        self.max_journal = max_journal
+        self.window_s = window_s
+        self.expire_every_s = expire_every_s
+        # ReplayStore optionnel, conservé d'un reset à l'autre (historique horodaté)
+        self.history = history
+        self.reset(pd.DataFrame())
+
+    def reset(self, df):
+        """Repart d'un jeu de données complet (ex : après le bouton de mise à jour)."""
+        with self.lock:
+            self.version = getattr(self, "version", 0) + 1
+            self.base_version = self.version
+            self.reset_version = self.version
+            self.journal = deque(maxlen=self.max_journal)
+            self.frames = [df] if not df.empty else []
+            self._frame_cache = None
+            self.flights = {}
+            self.last_contact = None
+            self.last_expiry = None
+            # Le moteur garde la dernière position de chaque avion d'un lot à l'autre
+            self.geofence = GeofenceEngine()
+            self.zone_events = {}
+            # Distribution des altitudes en mémoire fixe, sur la même fenêtre que les vols
+            self.stats = StreamingStats(window_s=self.window_s)
+            if not df.empty:
+                self._update_flights(df, self.version)
+
+    def ingest(self, chunk):
+        """Ajoute un lot de points transformés (avec 'predicted_anomaly') et retourne la nouvelle version."""
+        if chunk is None or chunk.empty:
+            return self.version
+        with self.lock:
+            self.version += 1
+            self.journal.append((self.version, chunk))
+            self.frames.append(chunk)
+            self._frame_cache = None
+            self._update_flights(chunk, self.version)
+            return self.version
+
+    def _update_flights(self, df, version):
+        df = df.sort_values("timestamp")
+        has_zone = "in_restricted_zone" in df.columns
+        for flight_id, group in df.groupby("flight_id", sort=False):
+            first = group.iloc[0]
+            last = group.iloc[-1]
+            status = self.flights.get(flight_id)
+            if status is None:
+                status = {
+                    "callsign": first["callsign"],
+                    "predicted_anomaly": first.get("predicted_anomaly", "N/A"),
+                    "confidence": None,
+                    "in_zone": False,
+                    "first_version": version,
+                }
+                self.flights[flight_id] = status
+            # Libellé par vol (inférence par fenêtres) : on garde le plus récent
+            status["predicted_anomaly"] = last.get("predicted_anomaly", status["predicted_anomaly"])
+            status["confidence"] = last.get("confidence", status["confidence"])
+            if has_zone and (group["in_restricted_zone"] == 1).any():
+                status["in_zone"] = True
+            status["last"] = last
+
+        # Mise à jour des sketches message par message, avec le libellé retenu pour le vol
+        for row in df[["flight_id", "altitude", "timestamp"]].itertuples(index=False):
+            self.stats.update(self.flights[row.flight_id]["predicted_anomaly"], row.timestamp, row.altitude)
+
+        # Traversées de zones entre deux messages, non visibles sur le flag par point
+        events = list(detect_zone_events(df, self.geofence).itertuples(index=False))
+        for event in events:
+            self.zone_events.setdefault(event.flight_id, []).append(event)
+            self.flights[event.flight_id]["in_zone"] = True
+
+        if self.history is not None:
+            self.history.append(df, zone_events=events)
+
+        ts_max = df["timestamp"].max()
+        if self.last_contact is None or ts_max > self.last_contact:
+            self.last_contact = ts_max
+        # Au-delà de max_gap_s sans message, le moteur repart de zéro pour l'avion : inutile de le garder
+        self.geofence.expire(self.last_contact - pd.Timedelta(seconds=self.geofence.max_gap_s))
+        self._expire(version)
+
+    def _expire(self, version):
+        """Oublie les vols et les points sortis de la fenêtre glissante (au plus toutes les expire_every_s)."""
+        if self.last_expiry is not None and (self.last_contact - self.last_expiry).total_seconds() < self.expire_every_s:
+            return
+        self.last_expiry = self.last_contact
+        horizon = self.last_contact - pd.Timedelta(seconds=self.window_s)
+
+        expired = [fid for fid, s in self.flights.items() if s["last"]["timestamp"] < horizon]
+        if not expired:
+            return
+        for flight_id in expired:
+            del self.flights[flight_id]
+            self.zone_events.pop(flight_id, None)
+        frames = [frame[frame["timestamp"] >= horizon] for frame in self.frames]
+        self.frames = [frame for frame in frames if not frame.empty]
+        self._frame_cache = None
+        # Les deltas ne savent qu'ajouter : les clients repartent d'un état complet
+        self.base_version = version
+
+    def snapshot(self):
+        """Retourne (version, DataFrame complet) ; la concaténation est mise en cache par version."""
+        with self.lock:
+            if self._frame_cache is None or self._frame_cache[0] != self.version:
+                df = pd.concat(self.frames, ignore_index=True) if self.frames else pd.DataFrame()
+                self._frame_cache = (self.version, df)
+            return self._frame_cache
+
+    def moved_past_reset(self):
+        """
+        Vrai si la fenêtre glissante a oublié des vols depuis le dernier reset : le jeu de données
+        du reset ne décrit plus l'état, un nouveau client doit partir de l'état live.
+        """
+        with self.lock:
+            return self.base_version != self.reset_version
+
+    def is_stale(self, client_version):
+        """Vrai si le client est trop en retard pour être mis à jour par deltas."""
+        if client_version is None or client_version < self.base_version:
+            return True
+        if self.journal and client_version < self.journal[0][0] - 1:
+            return True
+        return False
+
+    def flight_points_since(self, flight_id, client_version, until_version=None):
+        """Points du vol arrivés entre client_version (exclue) et until_version (incluse), None si aucun."""
+        with self.lock:
+            until_version = self.version if until_version is None else until_version
+            parts = [chunk[chunk["flight_id"] == flight_id]
+                     for version, chunk in self.journal if client_version < version <= until_version]
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return None
+        return pd.concat(parts).sort_values("timestamp")
+
+    def flight_options(self, since_version=None, until_version=None):
+        """
+        Options du dropdown, limitées aux vols apparus entre since_version et until_version si précisés.
+        Le libellé IA n'est pas dans le texte de l'option : il peut changer après l'envoi de l'option
+        (voir le panneau de détail).
+        """
+        with self.lock:
+            return [
+                {'label': f"{s['callsign']} ({fid})", 'value': fid}
+                for fid, s in self.flights.items()
+                if (since_version is None or s["first_version"] > since_version)
+                and (until_version is None or s["first_version"] <= until_version)
+            ]
+
+    def flight_status(self, flight_id):
+        """Libellé actuel, confiance et passage en zone d'un vol, ou None s'il n'est pas suivi."""
+        with self.lock:
+            status = self.flights.get(flight_id)
+            return dict(status) if status is not None else None
+
+    def flight_zone_events(self, flight_id):
+        """Entrées/sorties de zones restreintes détectées pour un vol."""
+        with self.lock:
+            return list(self.zone_events.get(flight_id, []))
+
+    def intrusion_flights(self):
+        """Vols ayant au moins un événement (entrée ou sortie) de zone restreinte."""
+        with self.lock:
+            return set(self.zone_events)
+
+    def kpis(self):
+        """
+        KPIs globaux, dans l'ordre et le format des cartes du dashboard.
+        Tous sont comptés sur les vols de la fenêtre glissante, avec leur libellé actuel.
+        """
+        with self.lock:
+            total_flights = len(self.flights)
+            nb_anomalies = sum(1 for s in self.flights.values() if s["predicted_anomaly"] != "Normal")
+            nb_restricted = sum(1 for s in self.flights.values() if s["in_zone"])
+            last_contact = self.last_contact
+
+        return format_kpis(total_flights, nb_anomalies, nb_restricted, last_contact)
+
+    def stats_summary(self):
+        """Répartition des vols de la fenêtre par type d'anomalie et quartiles d'altitude (sketches)."""
+        with self.lock:
+            flights_by_label = Counter(s["predicted_anomaly"] for s in self.flights.values())
+            return dict(flights_by_label), self.stats.box_stats()
+
+    def critical_rows(self, top=5):
+        """Lignes du tableau critique : IA anormale ou zone restreinte, les plus récentes d'abord."""
+        with self.lock:
+            critical = [
+                (fid, s) for fid, s in self.flights.items()
+                if s["predicted_anomaly"] != "Normal" or s["in_zone"]
+            ]
+        critical.sort(key=lambda item: item[1]["last"]["timestamp"], reverse=True)
+
+        return [make_critical_row(fid, s["last"], s["in_zone"]) for fid, s in critical[:top]]
+
+
+def format_kpis(total_flights, nb_anomalies, nb_restricted, last_contact):
+    """Valeurs des 5 cartes KPI, au format affiché par le dashboard."""
+    ratio = f"{(nb_anomalies/total_flights*100):.1f}%" if total_flights > 0 else "0%"
+    last_contact = last_contact.strftime('%H:%M:%S') + " UTC+0" if last_contact is not None else "-"
+    return [str(total_flights), str(nb_anomalies), str(nb_restricted), ratio, last_contact]
+
+
+def make_critical_row(flight_id, last, in_zone):
+    """
+    Ligne du tableau critique à partir du dernier point connu d'un vol (Series ou dict).
+    :param in_zone: passage en zone restreinte sur l'ensemble du vol (point dans une zone ou traversée).
+    """
+    return {
+        "flight_id": flight_id,
+        "callsign": last["callsign"],
+        "predicted_anomaly": last.get("predicted_anomaly", "N/A"),
+        "in_restricted_zone": int(in_zone),
+        "ground_speed": last["ground_speed"],
+        "altitude": last["altitude"],
+        "timestamp": last["timestamp"].strftime('%H:%M:%S')
+    }
+
+
+def critical_row_key(row):
+    """Identifiant d'une ligne du tableau critique, pour comparer deux versions du tableau."""
+    return f"{row['flight_id']}|{row['timestamp']}|{row['predicted_anomaly']}|{row['in_restricted_zone']}"
+
+
+def patch_critical_table(old_keys, new_rows):
+    """Patch du tableau critique : seules les lignes entrantes, sortantes ou modifiées sont envoyées."""
+    new_keys = [critical_row_key(row) for row in new_rows]
+    if new_keys == old_keys:
+        return no_update
+
+    table_patch = Patch()
+    for idx, row in enumerate(new_rows):
+        if idx >= len(old_keys):
+            table_patch.append(row)
+        elif old_keys[idx] != new_keys[idx]:
+            table_patch[idx] = row
+    # Suppression des lignes en trop, en partant de la fin pour garder les indices valides
+    for idx in range(len(old_keys) - 1, len(new_rows) - 1, -1):
+        del table_patch[idx]
+    return table_patch
+
+
+class LiveFeeder(threading.Thread):
+    """
+    Thread d'acquisition du mode live : lit le flux ADS-B, transforme les messages par lots
+    et les pousse dans un LiveState.
+    """
+
+    def __init__(self, state, predict_fn=None, on_chunk=None, batch_size=200, flush_seconds=2.0,
+                 max_track_points=256, idle_s=1800):
+        super().__init__(daemon=True)
+        self.state = state
+        self.predict_fn = predict_fn
+        # Appelé avec chaque lot ingéré (ex : indexation des vols terminés)
+        self.on_chunk = on_chunk
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.stop_event = threading.Event()
+        # Dernières valeurs connues par avion, pour compléter les messages partiels
+        self.memory = {}
+        # Trace de chaque vol (bornée à max_track_points) et nombre de points reçus,
+        # pour calculer les features sur le vol entier et non sur le seul lot
+        self.max_track_points = max_track_points
+        self.idle_s = idle_s
+        self.tracks = {}
+        self.counters = {}
+        self.last_seen = {}
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _fill_from_memory(self, fields):
+        hex_ident = fields[SBS_COLUMNS.index("HexIdent")]
+        known = self.memory.setdefault(hex_ident, {})
+        for col in MEMORY_COLUMNS:
+            idx = SBS_COLUMNS.index(col)
+            if fields[idx].strip():
+                known[col] = fields[idx]
+            elif col in known:
+                fields[idx] = known[col]
+        return fields
+
+    def _apply_flight_history(self, chunk):
+        """
+        Recalcule route prévue, déviation et pilote automatique de chaque point du lot
+        avec les points déjà reçus du vol (transform_raw_data ne voit que le lot).
+        Différences assumées avec le traitement d'un fichier complet, où le vol est connu
+        jusqu'à son dernier point :
+        - la route prévue (départ, milieu, dernier point) est celle du vol à ce stade ;
+        - la coupure des 10 % de points finaux n'est pas appliquée, la fin du vol étant inconnue.
+        """
+        deviation = pd.Series(0.0, index=chunk.index)
+        autopilot = pd.Series(0, index=chunk.index)
+        for flight_id, group in chunk.groupby("flight_id", sort=False):
+            group = group.sort_values("timestamp")
+            positions = group[["latitude", "longitude", "timestamp"]]
+            track = pd.concat([self.tracks[flight_id], positions]) if flight_id in self.tracks else positions
+            while len(track) > self.max_track_points:
+                # Un point sur deux : le premier point (départ) est conservé
+                track = track.iloc[::2]
+            self.tracks[flight_id] = track
+            self.last_seen[flight_id] = group["timestamp"].max()
+
+            route = decode_polyline(generate_polyline(track))
+            deviation[group.index] = [
+                compute_deviation({"latitude": lat, "longitude": lon, "route_points": route})
+                for lat, lon in zip(group["latitude"], group["longitude"])
+            ]
+
+            start = self.counters.get(flight_id, 0)
+            total = start + len(group)
+            self.counters[flight_id] = total
+            autopilot[group.index] = (np.arange(start, total) >= total * 0.10).astype(int)
+
+        # Oubli des avions silencieux
+        now = chunk["timestamp"].max()
+        for flight_id in [fid for fid, ts in self.last_seen.items() if (now - ts).total_seconds() > self.idle_s]:
+            del self.tracks[flight_id], self.counters[flight_id], self.last_seen[flight_id]
+            self.memory.pop(flight_id, None)
+
+        return chunk.assign(deviation_m=deviation, autopilot_on=autopilot)
+
+    def _flush(self, buffer):
+        # Champs vides -> None dès la construction (replace("", np.nan) déclenche un FutureWarning pandas)
+        df_raw = pd.DataFrame([[value if value != "" else None for value in fields] for fields in buffer],
+                              columns=SBS_COLUMNS)
+        chunk = transform_raw_data(df_raw, verbose=False)
+        if chunk is None:
+            return
+        chunk = self._apply_flight_history(chunk.reset_index(drop=True))
+        if self.predict_fn is not None:
+            # Libellé et confiance par vol (ex : FlightInferenceSession.update)
+            flights = self.predict_fn(chunk)
+            chunk["predicted_anomaly"] = chunk["flight_id"].map(flights["predicted_anomaly"])
+            chunk["confidence"] = chunk["flight_id"].map(flights["confidence"])
+        else:
+            chunk["predicted_anomaly"] = "Modèle non chargé"
+        self.state.ingest(chunk)
+        if self.on_chunk is not None:
+            self.on_chunk(chunk)
+
+    def run(self):
+        buffer = []
+        last_flush = time.time()
+        try:
+            for fields in stream_messages_from_websocket(stop_event=self.stop_event):
+                buffer.append(self._fill_from_memory(fields))
+                if len(buffer) >= self.batch_size or time.time() - last_flush >= self.flush_seconds:
+                    try:
+                        self._flush(buffer)
+                    except Exception as e:
+                        print(f"Erreur lot live : {e}")
+                    buffer = []
+                    last_flush = time.time()
+        except Exception as e:
+            print(f"Erreur flux live : {e}")
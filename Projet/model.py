@@ -1,15 +1,51 @@
 import joblib
+import numpy as np
 import pandas as pd
 import os
+import threading
+from collections import OrderedDict
+
+# Nombre de points consécutifs regroupés dans une fenêtre pour l'inférence par vol
+WINDOW_POINTS = 10
+
+class WindowCache:
+    """
+    Probabilités des fenêtres déjà scorées : (flight_id, fenêtre) -> (signature, probas).
+    Borné à max_size entrées (les moins récemment utilisées sont oubliées) et protégé par un verrou,
+    le dashboard et le thread live pouvant l'utiliser en même temps.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self.lock:
+            found = [self.entries.get(key) for key in keys]
+            for key, entry in zip(keys, found):
+                if entry is not None:
+                    self.entries.move_to_end(key)
+            return found
+
+    def put_many(self, items):
+        with self.lock:
+            for key, entry in items:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
 
 class FlightModel:
-    def __init__(self, model_folder="models"):
+    def __init__(self, model_folder="models", window_cache_size=100000):
         self.model_path = os.path.join(model_folder, "random_forest.joblib")
         self.encoder_path = os.path.join(model_folder, "label_encoder.joblib")
         self.model = None
         self.encoder = None
         self.features = ["latitude", "longitude", "altitude", "ground_speed", 
                          "heading", "autopilot_on", "deviation_m"]
+        # Cache des fenêtres scorées par predict_flights (hors sessions live, qui ont le leur)
+        self.window_cache = WindowCache(window_cache_size)
 
     def load_model(self):
         """Charge le modèle et l'encodeur en mémoire."""
@@ -52,6 +88,145 @@ class FlightModel:
 
         return prediction_labels
 
+    def _window_features(self, df, window_points):
+        """Résumé de chaque fenêtre : moyenne des features (cap moyen circulaire), taille et dernier horodatage."""
+        df = df.sort_values(["flight_id", "timestamp"])
+        if "point_index" in df.columns:
+            position = df["point_index"]
+        else:
+            position = df.groupby("flight_id").cumcount()
+        heading = np.radians(df["heading"].astype(float))
+        df = df.assign(window=position // window_points, heading_sin=np.sin(heading), heading_cos=np.cos(heading))
+
+        numeric = [f for f in self.features if f != "heading"]
+        grouped = df.groupby(["flight_id", "window"])
+        windows = grouped[numeric + ["heading_sin", "heading_cos"]].mean()
+        windows["heading"] = np.degrees(np.arctan2(windows["heading_sin"], windows["heading_cos"])) % 360
+        windows["autopilot_on"] = windows["autopilot_on"].round()
+        windows["n_points"] = grouped.size()
+        windows["last_timestamp"] = grouped["timestamp"].max()
+        return windows.reset_index()
+
+    def predict_flights(self, data, window_points=WINDOW_POINTS, cache=None, rescore_partial=True):
+        """
+        Inférence par vol : les points de chaque vol sont regroupés en fenêtres de window_points
+        points, chaque fenêtre est scorée une seule fois, puis les probabilités sont moyennées
+        (pondérées par la taille des fenêtres) pour donner un libellé stable par vol.
+        Une fenêtre dont le contenu n'a pas changé depuis l'appel précédent n'est pas rescorée.
+        :param data: DataFrame transformé (flight_id, timestamp + features). Une colonne
+                     'point_index' optionnelle fixe la position absolue des points (mode flux).
+        :param cache: WindowCache à utiliser (par défaut celui du modèle).
+        :param rescore_partial: si False (mode flux), une fenêtre incomplète n'est scorée que si
+                                son vol n'a pas d'autre fenêtre, et garde ensuite ce score
+                                jusqu'à ce qu'elle soit pleine.
+        :return: DataFrame indexé par flight_id : predicted_anomaly, confidence, windows,
+                 scored (fenêtres envoyées au modèle lors de cet appel).
+        """
+        if self.model is None:
+            self.load_model()
+
+        try:
+            windows = self._window_features(data, window_points)
+        except KeyError as e:
+            raise KeyError(f"Il manque des colonnes dans les données d'entrée : {e}")
+
+        cache = self.window_cache if cache is None else cache
+        probas = np.zeros((len(windows), len(self.model.classes_)))
+        keys = list(zip(windows["flight_id"], windows["window"]))
+        signatures = list(zip(windows["n_points"], windows["last_timestamp"]))
+
+        weights = windows["n_points"].to_numpy(dtype=float)
+        to_score = []
+        deferred = []
+        for i, (cached, signature) in enumerate(zip(cache.get_many(keys), signatures)):
+            partial = signature[0] < window_points
+            if cached is not None and (cached[0] == signature or (partial and not rescore_partial)):
+                probas[i] = cached[1]
+            elif partial and not rescore_partial:
+                deferred.append(i)
+            else:
+                to_score.append(i)
+
+        # Fenêtre incomplète jamais scorée : on attend qu'elle soit pleine, sauf si
+        # c'est la seule fenêtre de son vol (il faut bien un premier libellé)
+        deferred_rows = set(deferred)
+        labelled = {key[0] for i, key in enumerate(keys) if i not in deferred_rows}
+        for i in deferred:
+            if keys[i][0] in labelled:
+                weights[i] = 0
+            else:
+                to_score.append(i)
+
+        # Un seul appel au modèle pour toutes les fenêtres nouvelles ou modifiées
+        if to_score:
+            probas[to_score] = self.model.predict_proba(windows.iloc[to_score][self.features])
+            cache.put_many((keys[i], (signatures[i], probas[i].copy())) for i in to_score)
+        scored = np.zeros(len(windows), dtype=int)
+        scored[to_score] = 1
+
+        weighted = pd.DataFrame(probas * weights[:, None])
+        summed = weighted.groupby(windows["flight_id"].to_numpy()).sum()
+        flight_ids = summed.index
+        flight_probas = summed.div(summed.sum(axis=1), axis=0).to_numpy()
+
+        best = flight_probas.argmax(axis=1)
+        per_flight = pd.DataFrame({"windows": 1, "scored": scored}).groupby(windows["flight_id"].to_numpy()).sum()
+        return pd.DataFrame({
+            "predicted_anomaly": self.encoder.inverse_transform(self.model.classes_[best]),
+            "confidence": flight_probas.max(axis=1),
+            "windows": per_flight["windows"].reindex(flight_ids).to_numpy(),
+            "scored": per_flight["scored"].reindex(flight_ids).to_numpy()
+        }, index=flight_ids)
+
+
+class FlightInferenceSession:
+    """
+    Inférence par vol en flux (mode live) : garde les derniers points de chaque vol
+    (au plus max_points, par fenêtres entières) et numérote les points de façon absolue,
+    pour que les numéros de fenêtre restent stables d'un lot à l'autre.
+    Chaque fenêtre est scorée une fois, quand elle est pleine ; la fenêtre en cours ne l'est
+    plus tôt que si c'est la première du vol, qui n'aurait sinon pas de libellé.
+    La session a son propre cache, indépendant de celui du modèle partagé avec le dashboard.
+    Les vols sans message depuis idle_s secondes sont oubliés.
+    """
+
+    def __init__(self, model, window_points=WINDOW_POINTS, max_points=2000, idle_s=1800, cache_size=100000):
+        self.model = model
+        self.window_points = window_points
+        self.max_points = max_points
+        self.idle_s = idle_s
+        self.cache = WindowCache(cache_size)
+        self.buffers = {}
+        self.counters = {}
+        self.last_seen = {}
+
+    def update(self, chunk):
+        """
+        Ajoute un lot de points et retourne predict_flights pour les vols du lot
+        (interface predict_fn du LiveFeeder).
+        """
+        columns = ["flight_id", "timestamp"] + self.model.features
+        for flight_id, group in chunk.groupby("flight_id"):
+            group = group.sort_values("timestamp")[columns]
+            start = self.counters.get(flight_id, 0)
+            group = group.assign(point_index=np.arange(start, start + len(group)))
+            self.counters[flight_id] = start + len(group)
+
+            buffer = pd.concat([self.buffers[flight_id], group]) if flight_id in self.buffers else group
+            if len(buffer) > self.max_points:
+                # On retire des fenêtres entières pour garder les numéros de fenêtre stables
+                excess = len(buffer) - self.max_points
+                buffer = buffer.iloc[(excess // self.window_points + 1) * self.window_points:]
+            self.buffers[flight_id] = buffer
+            self.last_seen[flight_id] = group["timestamp"].max()
+
+        now = chunk["timestamp"].max()
+        for flight_id in [fid for fid, ts in self.last_seen.items() if (now - ts).total_seconds() > self.idle_s]:
+            del self.buffers[flight_id], self.counters[flight_id], self.last_seen[flight_id]
+
+        touched = pd.concat([self.buffers[fid] for fid in chunk["flight_id"].unique()])
+        return self.model.predict_flights(touched, self.window_points, cache=self.cache, rescore_partial=False)
+
 # --- Exemple d'utilisation autonome ---
 if __name__ == "__main__":
     # Création de données factices pour tester
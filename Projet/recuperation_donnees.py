@@ -3,8 +3,17 @@ import csv
 import os
 import time
 import sys
+import pandas as pd
 from dotenv import load_dotenv
 
+# Configuration Colonnes ADS-B (Format SBS-1 BaseStation)
+SBS_COLUMNS = [
+    "MessageType", "TransmissionType", "SessionID", "AircraftID", "HexIdent", "FlightID",
+    "DateGenerated", "TimeGenerated", "DateLogged", "TimeLogged", "Callsign", "Altitude",
+    "GroundSpeed", "Track", "Latitude", "Longitude", "VerticalRate", "Squawk", "Alert",
+    "Emergency", "SPI", "IsOnGround"
+]
+
 def load_data_from_websocket(nb_messages=5000, output_file="test_data_dashboard.csv"):
     """
     Récupère des données ADS-B de manière robuste.
@@ -23,13 +32,7 @@ def load_data_from_websocket(nb_messages=5000, output_file="test_data_dashboard.
 
     PORT = int(port_value)
 
-    # Configuration Colonnes ADS-B (Format SBS-1 BaseStation)
-    cols = [
-        "MessageType", "TransmissionType", "SessionID", "AircraftID", "HexIdent", "FlightID",
-        "DateGenerated", "TimeGenerated", "DateLogged", "TimeLogged", "Callsign", "Altitude",
-        "GroundSpeed", "Track", "Latitude", "Longitude", "VerticalRate", "Squawk", "Alert",
-        "Emergency", "SPI", "IsOnGround"
-    ]
+    cols = SBS_COLUMNS
 
     # --- Paramètres de robustesse ---
     MAX_RETRIES = 5          # Nombre max d'essais de reconnexion consécutifs
@@ -124,5 +127,93 @@ def load_data_from_websocket(nb_messages=5000, output_file="test_data_dashboard.
     print(f"Total récupéré : {messages_count} / {nb_messages}")
     print(f"Données enregistrées dans : {output_file}")
 
+def stream_messages_from_websocket(stop_event=None):
+    """
+    Générateur de messages ADS-B pour le mode live du dashboard.
+    Produit une liste de champs (alignée sur SBS_COLUMNS) par message MSG reçu,
+    sans écrire de fichier. Même politique de reconnexion que load_data_from_websocket.
+    :param stop_event: threading.Event optionnel ; la lecture s'arrête dès qu'il est levé.
+    """
+    load_dotenv()
+
+    HOST = os.getenv("HOST")
+    port_value = os.getenv("PORT")
+    if port_value is None:
+        raise ValueError("La variable d'environnement PORT n'est pas définie.")
+
+    PORT = int(port_value)
+
+    MAX_RETRIES = 5
+    TIMEOUT_SOCKET = 10.0
+    RETRY_DELAY = 2
+
+    consecutive_errors = 0
+
+    while stop_event is None or not stop_event.is_set():
+
+        if consecutive_errors >= MAX_RETRIES:
+            print(f"❌ ABANDON (live) : Trop d'erreurs consécutives ({consecutive_errors}).")
+            return
+
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(TIMEOUT_SOCKET)
+                s.connect((HOST, PORT))
+                consecutive_errors = 0
+
+                # Les messages peuvent être coupés entre deux recv : on garde le reliquat
+                pending = ""
+                while stop_event is None or not stop_event.is_set():
+                    try:
+                        chunk = s.recv(4096).decode(errors="ignore")
+                    except socket.timeout:
+                        continue
+
+                    if not chunk:
+                        print("⚠️ Le serveur a fermé la connexion (EOF).")
+                        break
+
+                    pending += chunk
+                    lines = pending.split("\n")
+                    pending = lines.pop()
+
+                    for line in lines:
+                        line = line.strip()
+                        if line.startswith("MSG"):
+                            fields = line.split(",")
+                            if len(fields) < len(SBS_COLUMNS):
+                                fields += [""] * (len(SBS_COLUMNS) - len(fields))
+                            yield fields[:len(SBS_COLUMNS)]
+
+        except (socket.error, ConnectionRefusedError, TimeoutError) as e:
+            consecutive_errors += 1
+            print(f"\n❌ Erreur Connexion (live) : {e}")
+            time.sleep(RETRY_DELAY)
+            RETRY_DELAY *= 1.5
+
+def read_capture(path):
+    """
+    Lit un fichier de capture ADS-B et retourne un DataFrame aux colonnes SBS_COLUMNS.
+    Formats acceptés : CSV avec en-tête SBS-1 (ex : raw_data.csv), ou une ligne MSG brute
+    par ligne, éventuellement dans une colonne unique "Message" (captures adsb_data_*.csv).
+    """
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        header = f.readline()
+    if "HexIdent" in header:
+        return pd.read_csv(path)
+
+    rows = []
+    with open(path, newline="", encoding="utf-8", errors="ignore") as f:
+        for record in csv.reader(f):
+            # Colonne "Message" : la ligne MSG complète est dans un seul champ
+            fields = record[0].split(",") if len(record) == 1 else record
+            if not fields or fields[0].strip() != "MSG":
+                continue
+            if len(fields) < len(SBS_COLUMNS):
+                fields += [""] * (len(SBS_COLUMNS) - len(fields))
+            rows.append([value if value != "" else None for value in fields[:len(SBS_COLUMNS)]])
+
+    return pd.DataFrame(rows, columns=SBS_COLUMNS)
+
 if __name__ == "__main__":
     load_data_from_websocket()
@@ -0,0 +1,199 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import pandas as pd
+
+from geofence import ENTRY
+from live_state import format_kpis, make_critical_row
+
+POINT_COLUMNS = ["flight_id", "callsign", "latitude", "longitude", "altitude", "ground_speed",
+                 "heading", "in_restricted_zone", "predicted_anomaly", "timestamp"]
+
+
+def apply_point(state, point):
+    """
+    Applique un point à l'état de l'espace aérien (dernier point, passage en zone).
+    Le libellé d'un vol à l'instant t est celui de son dernier point reçu avant t.
+    """
+    status = state.get(point["flight_id"])
+    status = dict(status) if status is not None else {"in_zone": False}
+    status["last"] = point
+    if point.get("in_restricted_zone", 0) == 1 or point.get("crossed_zone", False):
+        status["in_zone"] = True
+    state[point["flight_id"]] = status
+
+
+class ReplayStore:
+    """
+    Historique de l'espace aérien pour le mode replay.
+    Pour chaque minute : un snapshot de l'état au début de la minute et la liste des points
+    reçus pendant la minute (delta). Se placer à un instant t revient à lire un snapshot
+    et à rejouer au plus une minute de points, quelle que soit la profondeur de l'historique.
+
+    Avec un dossier, chaque minute close est écrite dans un fichier joblib et seules les
+    cache_size dernières minutes lues restent en mémoire. Les points arrivant après la
+    clôture de leur minute (ou déjà historisés, ex : fichier rechargé) sont ignorés.
+    À l'ouverture, l'état de l'espace aérien est reconstruit à partir de la dernière minute
+    écrite ; flush() écrit la minute en cours (à appeler à l'arrêt de l'application).
+    """
+
+    def __init__(self, directory=None, snapshot_s=60, active_s=600, cache_size=32):
+        self.lock = threading.Lock()
+        self.directory = directory
+        self.snapshot_s = snapshot_s
+        # Un avion sans message depuis active_s secondes ne fait plus partie de l'espace aérien
+        self.active_s = active_s
+        self.cache_size = cache_size
+
+        self.minutes = []
+        self.records = OrderedDict()
+        self.state = {}
+        self.open_minute = None
+        self.open_snapshot = None
+        self.open_delta = []
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.minutes = sorted(int(name[len("minute_"):-len(".joblib")])
+                                  for name in os.listdir(directory)
+                                  if name.startswith("minute_") and name.endswith(".joblib"))
+            if self.minutes:
+                # Reprise après redémarrage : état à la fin de la dernière minute écrite
+                snapshot, delta = self._load(self.minutes[-1])
+                self.state = dict(snapshot)
+                for point in delta:
+                    apply_point(self.state, point)
+                self._forget_inactive(self.minutes[-1])
+
+    def _minute_id(self, timestamp):
+        return int(timestamp.timestamp() // self.snapshot_s)
+
+    def minute_start(self, minute_id):
+        return pd.Timestamp(minute_id * self.snapshot_s, unit="s")
+
+    def _path(self, minute_id):
+        return os.path.join(self.directory, f"minute_{minute_id}.joblib")
+
+    def append(self, df, zone_events=()):
+        """
+        Historise un lot de points transformés (avec 'predicted_anomaly').
+        :param zone_events: GeofenceEvent du lot (détecteur de segments) ; un vol n'est marqué
+                            en zone qu'à partir de l'heure de sa première entrée.
+        """
+        if df.empty:
+            return
+        columns = [c for c in POINT_COLUMNS if c in df.columns]
+        entry_times = {}
+        for event in zone_events:
+            if event.event == ENTRY and (event.flight_id not in entry_times or event.timestamp < entry_times[event.flight_id]):
+                entry_times[event.flight_id] = event.timestamp
+        with self.lock:
+            for point in df.sort_values("timestamp")[columns].to_dict("records"):
+                minute = self._minute_id(point["timestamp"])
+                if self.minutes and minute <= self.minutes[-1]:
+                    continue
+                if self.open_minute is not None and minute < self.open_minute:
+                    continue
+                if self.open_minute is None or minute > self.open_minute:
+                    self._close_minute()
+                    self.open_minute = minute
+                    self.open_snapshot = dict(self.state)
+                    self.open_delta = []
+                entry_time = entry_times.get(point["flight_id"])
+                point["crossed_zone"] = entry_time is not None and point["timestamp"] >= entry_time
+                apply_point(self.state, point)
+                self.open_delta.append(point)
+
+    def _close_minute(self):
+        if self.open_minute is None:
+            return
+        record = (self.open_snapshot, self.open_delta)
+        self.minutes.append(self.open_minute)
+        if self.directory:
+            joblib.dump(record, self._path(self.open_minute))
+        self._cache(self.open_minute, record)
+        self._forget_inactive(self.open_minute)
+        self.open_minute = None
+
+    def _forget_inactive(self, minute_id):
+        # Oubli des avions inactifs : la taille des snapshots suit l'espace aérien, pas l'historique
+        horizon = self.minute_start(minute_id + 1) - pd.Timedelta(seconds=self.active_s)
+        self.state = {fid: s for fid, s in self.state.items() if s["last"]["timestamp"] >= horizon}
+
+    def flush(self):
+        """
+        Écrit la minute en cours sans la clore. Après un redémarrage, elle est relue comme
+        une minute close : les points reçus ensuite pour cette minute seront ignorés.
+        """
+        with self.lock:
+            if self.directory and self.open_minute is not None:
+                joblib.dump((self.open_snapshot, self.open_delta), self._path(self.open_minute))
+
+    def _cache(self, minute_id, record):
+        self.records[minute_id] = record
+        self.records.move_to_end(minute_id)
+        if self.directory:
+            while len(self.records) > self.cache_size:
+                self.records.popitem(last=False)
+
+    def _load(self, minute_id):
+        record = self.records.get(minute_id)
+        if record is None:
+            record = joblib.load(self._path(minute_id))
+        self._cache(minute_id, record)
+        return record
+
+    def time_range(self):
+        """(première minute, dernière minute) disponibles, ou None si l'historique est vide."""
+        with self.lock:
+            minutes = list(self.minutes[:1]) + list(self.minutes[-1:])
+            if self.open_minute is not None:
+                minutes.append(self.open_minute)
+        if not minutes:
+            return None
+        return min(minutes), max(minutes)
+
+    def seek(self, timestamp):
+        """État des avions actifs à l'instant donné : {flight_id: {'last', 'in_zone'}}."""
+        minute = self._minute_id(timestamp)
+        with self.lock:
+            if self.open_minute is not None and minute >= self.open_minute:
+                snapshot, delta = self.open_snapshot, list(self.open_delta)
+            else:
+                idx = bisect.bisect_right(self.minutes, minute) - 1
+                if idx < 0:
+                    return {}
+                snapshot, delta = self._load(self.minutes[idx])
+
+        state = dict(snapshot)
+        for point in delta:
+            if point["timestamp"] > timestamp:
+                continue
+            apply_point(state, point)
+
+        horizon = timestamp - pd.Timedelta(seconds=self.active_s)
+        return {fid: s for fid, s in state.items() if horizon <= s["last"]["timestamp"] <= timestamp}
+
+
+def state_kpis(state):
+    """KPIs du dashboard calculés sur un état rejoué."""
+    nb_anomalies = sum(1 for s in state.values() if s["last"].get("predicted_anomaly", "N/A") != "Normal")
+    nb_restricted = sum(1 for s in state.values() if s["in_zone"])
+    last_contact = max((s["last"]["timestamp"] for s in state.values()), default=None)
+    return format_kpis(len(state), nb_anomalies, nb_restricted, last_contact)
+
+
+def state_critical_rows(state, top=5):
+    """Vols critiques (IA anormale ou zone restreinte) d'un état rejoué, les plus récents d'abord."""
+    critical = [(fid, s) for fid, s in state.items()
+                if s["last"].get("predicted_anomaly", "N/A") != "Normal" or s["in_zone"]]
+    critical.sort(key=lambda item: item[1]["last"]["timestamp"], reverse=True)
+    return [make_critical_row(fid, s["last"], s["in_zone"]) for fid, s in critical[:top]]
+
+
+def state_positions(state):
+    """Dernière position connue de chaque avion actif, pour la carte de l'espace aérien."""
+    return pd.DataFrame([s["last"] for s in state.values()])
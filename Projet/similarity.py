@@ -0,0 +1,262 @@
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.neighbors import BallTree
+
+# Nombre de points de rééchantillonnage par trajectoire
+EMBEDDING_POINTS = 16
+
+
+def flight_embedding(flight_df, n_points=EMBEDDING_POINTS):
+    """
+    Vecteur de taille fixe décrivant la forme d'une trajectoire.
+    Le vol est rééchantillonné sur n_points instants régulièrement espacés ; pour chaque instant :
+    altitude, vitesse, cap (sin/cos) et position relative au premier point (km est/nord).
+    Les canaux sont ramenés à des ordres de grandeur comparables par des échelles fixes,
+    pour que les vecteurs de vols différents restent comparables sans réapprentissage.
+    Retourne None si le vol a moins de deux points.
+    """
+    flight_df = flight_df.sort_values("timestamp")
+    if len(flight_df) < 2:
+        return None
+
+    t = (flight_df["timestamp"] - flight_df["timestamp"].iloc[0]).dt.total_seconds().to_numpy(dtype=float)
+    if t[-1] <= 0:
+        # Horodatages identiques : on rééchantillonne sur l'ordre des points
+        t = np.arange(len(flight_df), dtype=float)
+    grid = np.linspace(t[0], t[-1], n_points)
+
+    lat = flight_df["latitude"].to_numpy(dtype=float)
+    lon = flight_df["longitude"].to_numpy(dtype=float)
+    heading = np.radians(flight_df["heading"].to_numpy(dtype=float))
+    north_km = (lat - lat[0]) * 111.0
+    east_km = (lon - lon[0]) * 111.0 * math.cos(math.radians(lat[0]))
+
+    channels = [
+        flight_df["altitude"].ffill().bfill().fillna(0).to_numpy(dtype=float) / 10000.0,
+        flight_df["ground_speed"].to_numpy(dtype=float) / 100.0,
+        np.sin(heading),
+        np.cos(heading),
+        east_km / 50.0,
+        north_km / 50.0,
+    ]
+    vector = np.concatenate([np.interp(grid, t, channel) for channel in channels])
+    return vector if np.all(np.isfinite(vector)) else None
+
+
+class TrajectoryIndex:
+    """
+    Index de recherche des vols les plus proches d'une trajectoire donnée.
+    Les vecteurs sont projetés par PCA puis rangés dans un BallTree. Les vols ajoutés
+    après la dernière construction sont projetés à l'ajout et gardés dans un tampon parcouru
+    en force brute ; l'arbre est reconstruit quand ce tampon dépasse rebuild_ratio de la taille
+    indexée. La reconstruction se fait hors du verrou : les requêtes continuent sur l'ancien
+    arbre, puis le nouveau est substitué avec les vols ajoutés entre-temps.
+    """
+
+    def __init__(self, n_components=16, leaf_size=40, rebuild_ratio=0.1, min_rebuild=200):
+        self.n_components = n_components
+        self.leaf_size = leaf_size
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self.lock = threading.Lock()
+        # Une seule reconstruction à la fois ; self.lock ne protège que l'état
+        self.build_lock = threading.Lock()
+
+        self.ids = []
+        self.labels = []
+        self.vectors = []
+        self.position = {}
+        self.removed = set()
+        self.pending = []
+        self.pending_matrix = None
+        self.tree = None
+        self.pca = None
+        self.tree_rows = 0
+
+    def __len__(self):
+        return len(self.position)
+
+    def add(self, flight_id, vector, label):
+        """Ajoute (ou remplace) le vecteur d'un vol."""
+        if vector is None:
+            return
+        with self.lock:
+            if flight_id in self.position:
+                self.removed.add(self.position[flight_id])
+            row = len(self.ids)
+            self.ids.append(flight_id)
+            self.labels.append(label)
+            self.vectors.append(np.asarray(vector, dtype=float))
+            self.position[flight_id] = row
+            self._append_pending(row)
+            needs_rebuild = len(self.pending) >= max(self.min_rebuild, self.rebuild_ratio * self.tree_rows)
+
+        # Si une reconstruction est déjà en cours, le tampon sera repris au prochain seuil
+        if needs_rebuild and self.build_lock.acquire(blocking=False):
+            try:
+                self._rebuild()
+            finally:
+                self.build_lock.release()
+
+    def build(self):
+        """Force la construction de l'arbre (ex : après un chargement initial en masse)."""
+        with self.build_lock:
+            with self.lock:
+                if not (self.pending or self.removed):
+                    return
+            self._rebuild()
+
+    def _append_pending(self, row):
+        """Projette un vecteur dans le tampon, dont la capacité double quand il est plein."""
+        projected = self._project(self.vectors[row][None, :])[0]
+        count = len(self.pending)
+        if self.pending_matrix is None or count == len(self.pending_matrix):
+            grown = np.empty((max(16, 2 * count), len(projected)))
+            if count:
+                grown[:count] = self.pending_matrix[:count]
+            self.pending_matrix = grown
+        self.pending_matrix[count] = projected
+        self.pending.append(row)
+
+    def _fit(self, matrix):
+        """PCA et BallTree sur les vecteurs compactés (appelé hors du verrou)."""
+        if len(matrix) > self.n_components and matrix.shape[1] > self.n_components:
+            pca = PCA(n_components=self.n_components).fit(matrix)
+        else:
+            pca = None
+        projected = pca.transform(matrix) if pca is not None else matrix
+        return pca, BallTree(projected, leaf_size=self.leaf_size)
+
+    def _rebuild(self):
+        # Photographie de l'état : les vecteurs remplacés sont oubliés (compactage)
+        with self.lock:
+            n_rows = len(self.ids)
+            removed = set(self.removed)
+            keep = [row for row in range(n_rows) if row not in removed]
+            matrix = np.vstack([self.vectors[row] for row in keep]) if keep else None
+
+        pca, tree = self._fit(matrix) if matrix is not None else (None, None)
+
+        with self.lock:
+            # Les lignes ajoutées pendant la construction suivent les lignes compactées
+            remap = {row: new_row for new_row, row in enumerate(keep)}
+            for row in range(n_rows, len(self.ids)):
+                remap[row] = len(keep) + row - n_rows
+            rows = keep + list(range(n_rows, len(self.ids)))
+            self.ids = [self.ids[row] for row in rows]
+            self.labels = [self.labels[row] for row in rows]
+            self.vectors = [self.vectors[row] for row in rows]
+            self.position = {flight_id: remap[row] for flight_id, row in self.position.items()}
+            # Vols remplacés pendant la construction : leur ancienne ligne est dans le nouvel arbre
+            self.removed = {remap[row] for row in self.removed if row not in removed}
+
+            self.pca, self.tree, self.tree_rows = pca, tree, len(keep)
+            self.pending, self.pending_matrix = [], None
+            for row in range(len(keep), len(self.ids)):
+                self._append_pending(row)
+
+    def _project(self, matrix):
+        return self.pca.transform(matrix) if self.pca is not None else matrix
+
+    def query(self, vector, k=5, exclude=None):
+        """
+        Les k vols les plus proches du vecteur donné.
+        :return: liste de (flight_id, label, distance), du plus proche au plus éloigné.
+        """
+        if vector is None:
+            return []
+        with self.lock:
+            query = self._project(np.asarray(vector, dtype=float)[None, :])
+            candidates = []
+
+            if self.tree is not None:
+                # Marge pour les lignes remplacées et le vol exclu, filtrés ensuite
+                k_tree = min(self.tree_rows, k + 1 + len(self.removed))
+                distances, rows = self.tree.query(query, k=k_tree)
+                candidates.extend(zip(rows[0], distances[0]))
+
+            if self.pending:
+                distances = np.linalg.norm(self.pending_matrix[:len(self.pending)] - query, axis=1)
+                candidates.extend(zip(self.pending, distances))
+
+            results = []
+            for row, distance in sorted(candidates, key=lambda c: c[1]):
+                if row in self.removed or self.ids[row] == exclude:
+                    continue
+                results.append((self.ids[row], self.labels[row], float(distance)))
+                if len(results) == k:
+                    break
+            return results
+
+    def query_flight(self, flight_id, k=5):
+        """Les k vols les plus proches d'un vol déjà indexé."""
+        with self.lock:
+            row = self.position.get(flight_id)
+            vector = self.vectors[row] if row is not None else None
+        return self.query(vector, k=k, exclude=flight_id)
+
+
+def index_flights(index, df, label_column="predicted_anomaly"):
+    """Ajoute à l'index tous les vols d'un DataFrame transformé, considérés comme terminés."""
+    if df.empty:
+        return
+    for flight_id, group in df.groupby("flight_id"):
+        label = group[label_column].mode()[0] if label_column in group.columns else "N/A"
+        index.add(flight_id, flight_embedding(group), label)
+    index.build()
+
+
+def build_reference_index(csv_path="dataset_trajectoires_anomalies.csv"):
+    """Index initialisé avec les vols étiquetés du dataset d'entraînement (Normal, Holding, ...)."""
+    index = TrajectoryIndex()
+    if not os.path.exists(csv_path):
+        return index
+
+    df = pd.read_csv(csv_path)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["anomaly_type"] = "Référence : " + df["anomaly_type"].astype(str)
+    index_flights(index, df, label_column="anomaly_type")
+    return index
+
+
+class FlightTracker:
+    """
+    Suit les vols en cours en mode live et les indexe une fois terminés
+    (aucun message depuis idle_s secondes). La trace gardée par vol est bornée
+    à max_points en ne conservant qu'un point sur deux quand elle déborde.
+    """
+
+    COLUMNS = ["flight_id", "latitude", "longitude", "altitude", "ground_speed", "heading", "timestamp"]
+
+    def __init__(self, index, idle_s=300, max_points=256):
+        self.index = index
+        self.idle_s = idle_s
+        self.max_points = max_points
+        self.tracks = {}
+        self.labels = {}
+        self.last_seen = {}
+
+    def update(self, chunk):
+        """À appeler sur chaque lot live ; retourne les identifiants des vols indexés."""
+        for flight_id, group in chunk.groupby("flight_id"):
+            track = group[self.COLUMNS]
+            if flight_id in self.tracks:
+                track = pd.concat([self.tracks[flight_id], track])
+            while len(track) > self.max_points:
+                track = track.iloc[::2]
+            self.tracks[flight_id] = track
+            # Libellé le plus récent : l'inférence live peut réviser le libellé d'un vol
+            self.labels[flight_id] = group["predicted_anomaly"].iloc[-1] if "predicted_anomaly" in group.columns else "N/A"
+            self.last_seen[flight_id] = group["timestamp"].max()
+
+        now = chunk["timestamp"].max()
+        completed = [fid for fid, ts in self.last_seen.items() if (now - ts).total_seconds() > self.idle_s]
+        for flight_id in completed:
+            self.index.add(flight_id, flight_embedding(self.tracks.pop(flight_id)), self.labels.pop(flight_id))
+            del self.last_seen[flight_id]
+        return completed
@@ -0,0 +1,153 @@
+"""
+Statistiques approchées en flux (sketches) pour un dashboard qui tourne plusieurs jours.
+
+Les KPIs par vol (vols suivis, alertes IA, intrusions) sont comptés exactement par LiveState
+sur les vols de la fenêtre glissante ; ce module couvre ce qui dépend du nombre de messages :
+la distribution des altitudes par type d'anomalie, qui alimente le box plot.
+
+Chaque message est rangé sous le libellé de son vol à l'arrivée du message. Un vol dont le
+libellé change (inférence par fenêtres) a donc ses altitudes réparties entre deux boîtes, alors
+que le camembert et les KPIs le comptent sous son seul libellé actuel.
+
+Chaque structure a une mémoire fixe, indépendante du nombre de messages reçus, et peut être
+fusionnée (merge) avec une structure de mêmes paramètres calculée sur un autre worker.
+
+Bornes d'erreur (paramètres par défaut) :
+- KLL (k=200) : erreur de rang normalisée de l'ordre de 1.65/k ≈ 1 % avec forte probabilité ;
+  au plus ~3k valeurs conservées quel que soit le volume. Min et max sont exacts.
+- Fenêtre glissante : découpée en tranches de bucket_s secondes, elle couvre entre
+  window_s - bucket_s et window_s secondes de messages.
+"""
+import math
+import random
+
+
+class KLLSketch:
+    """Quantiles approchés (ex : altitude) par compacteurs KLL."""
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.compactors = [[]]
+        self.n = 0
+        self.min = None
+        self.max = None
+        self._rng = random.Random(seed)
+
+    def _capacity(self, h):
+        depth = len(self.compactors) - h - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self):
+        return sum(len(c) for c in self.compactors)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value):
+        if value is None or value != value:  # ignore None / NaN
+            return
+        self.compactors[0].append(value)
+        self.n += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if self._size() >= self._max_size():
+            self._compress()
+
+    def _compress(self):
+        for h in range(len(self.compactors)):
+            if len(self.compactors[h]) >= self._capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self.compactors.append([])
+                items = sorted(self.compactors[h])
+                # Nombre impair : le plus grand élément reste au niveau h
+                keep = [items.pop()] if len(items) % 2 else []
+                offset = self._rng.randint(0, 1)
+                self.compactors[h + 1].extend(items[offset::2])
+                self.compactors[h] = keep
+                if self._size() < self._max_size():
+                    break
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        while self._size() >= self._max_size():
+            self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """Valeurs aux quantiles qs (liste de réels dans [0, 1])."""
+        weighted = sorted((value, 1 << h) for h, items in enumerate(self.compactors) for value in items)
+        if not weighted:
+            return [None] * len(qs)
+        total = sum(w for _, w in weighted)
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            if q >= 1:
+                results.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+
+class StreamingStats:
+    """
+    Distribution des altitudes par type d'anomalie prédite (libellé du vol à l'arrivée du message),
+    sur fenêtre glissante et en mémoire fixe :
+    un KLL par type et par tranche de bucket_s secondes, fusionnés à la lecture. Les tranches plus
+    vieilles que window_s (par rapport au message le plus récent, tous types confondus) sont oubliées.
+    """
+
+    def __init__(self, window_s=3600, bucket_s=60, k=200):
+        self.window_s = window_s
+        self.bucket_s = bucket_s
+        self.k = k
+        self.buckets = {}
+
+    def _bucket_id(self, timestamp):
+        return int(timestamp.timestamp() // self.bucket_s)
+
+    def _oldest_allowed(self):
+        return max(self.buckets) - self.window_s // self.bucket_s + 1
+
+    def _expire(self):
+        oldest_allowed = self._oldest_allowed()
+        for bucket_id in [b for b in self.buckets if b < oldest_allowed]:
+            del self.buckets[bucket_id]
+
+    def update(self, label, timestamp, altitude):
+        bucket_id = self._bucket_id(timestamp)
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None:
+            # Message trop en retard : sa tranche est déjà sortie de la fenêtre
+            if self.buckets and bucket_id < self._oldest_allowed():
+                return
+            bucket = self.buckets[bucket_id] = {}
+            self._expire()
+        bucket.setdefault(label, KLLSketch(self.k)).update(altitude)
+
+    def box_stats(self):
+        """Statistiques par type (min, q1, médiane, q3, max) pour un box plot précalculé."""
+        merged = {}
+        for bucket in self.buckets.values():
+            for label, sketch in bucket.items():
+                merged.setdefault(label, KLLSketch(self.k)).merge(sketch)
+        return {label: sketch.quantiles([0, 0.25, 0.5, 0.75, 1])
+                for label, sketch in merged.items() if sketch.n > 0}
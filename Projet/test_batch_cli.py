@@ -0,0 +1,78 @@
+import json
+import os
+
+import pandas as pd
+
+from batch_cli import CHECKPOINT_FILE, file_signature, is_done, run_batch
+from recuperation_donnees import SBS_COLUMNS, read_capture
+from test_transform_data import make_raw
+
+
+def write_msg_capture(path, raw):
+    """Capture au format adsb_data_*.csv : une ligne MSG complète par ligne dans la colonne "Message"."""
+    messages = [",".join(str(v) for v in row) for row in raw.itertuples(index=False)]
+    pd.DataFrame({"Message": messages}).to_csv(path, index=False)
+
+
+def test_read_capture_both_formats(tmp_path):
+    raw = make_raw("ABC123", 5)
+    header_path = tmp_path / "raw_data.csv"
+    raw.to_csv(header_path, index=False)
+    msg_path = tmp_path / "adsb_data_1.csv"
+    write_msg_capture(msg_path, raw)
+
+    for path in (header_path, msg_path):
+        df = read_capture(str(path))
+        assert list(df.columns) == SBS_COLUMNS
+        assert len(df) == 5
+        assert df["HexIdent"].tolist() == ["ABC123"] * 5
+        assert df["SessionID"].isna().all()
+        assert pd.to_numeric(df["Altitude"]).tolist() == [30000, 30010, 30020, 30030, 30040]
+
+
+def test_is_done_follows_file_signature(tmp_path):
+    capture = tmp_path / "adsb_data_1.csv"
+    capture.write_text("MSG\n")
+    output = tmp_path / "out.csv"
+    output.write_text("")
+    key = os.path.abspath(capture)
+
+    assert not is_done({}, str(capture))
+    checkpoint = {key: {**file_signature(str(capture)), "output": str(output)}}
+    assert is_done(checkpoint, str(capture))
+
+    # Sortie supprimée : à refaire ; capture sans vol (output None) : terminée
+    output.unlink()
+    assert not is_done(checkpoint, str(capture))
+    checkpoint[key]["output"] = None
+    assert is_done(checkpoint, str(capture))
+
+    # Capture modifiée : la signature ne correspond plus
+    capture.write_text("MSG\nMSG\n")
+    assert not is_done(checkpoint, str(capture))
+
+
+def test_run_batch_resumes_from_checkpoint(tmp_path, capsys):
+    input_dir = tmp_path / "captures"
+    input_dir.mkdir()
+    output_dir = tmp_path / "batch_output"
+    write_msg_capture(input_dir / "adsb_data_1.csv", make_raw("ABC123", 5))
+    write_msg_capture(input_dir / "adsb_data_2.csv", make_raw("DEF456", 5))
+
+    assert run_batch(str(input_dir), "adsb_data_*.csv", str(output_dir), workers=1, predict=False) == 0
+    checkpoint = json.loads((output_dir / CHECKPOINT_FILE).read_text(encoding="utf-8"))
+    assert len(checkpoint) == 2
+    for entry in checkpoint.values():
+        assert os.path.isabs(entry["output"]) and os.path.exists(entry["output"])
+        assert entry["flights"] == 1
+
+    # Deuxième exécution : tout est ignoré ; puis seule la capture modifiée est retraitée
+    capsys.readouterr()
+    run_batch(str(input_dir), "adsb_data_*.csv", str(output_dir), workers=1, predict=False)
+    assert "Déjà traitées : 2 | À traiter : 0" in capsys.readouterr().out
+
+    write_msg_capture(input_dir / "adsb_data_2.csv", make_raw("DEF456", 8))
+    run_batch(str(input_dir), "adsb_data_*.csv", str(output_dir), workers=1, predict=False)
+    out = capsys.readouterr().out
+    assert "Déjà traitées : 1 | À traiter : 1" in out
+    assert "adsb_data_2.csv : 8 messages" in out
@@ -0,0 +1,62 @@
+import pandas as pd
+
+from geofence import ENTRY, EXIT, GeofenceEngine, clip_segment
+
+# Zone carrée de 1° x 1° : [SW, NW, NE, SE]
+ZONES = {"Test": [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]}
+BOX = (0.0, 1.0, 0.0, 1.0)
+T0 = pd.Timestamp("2025-12-05 14:00:00")
+
+
+def at(seconds):
+    return T0 + pd.Timedelta(seconds=seconds)
+
+
+def test_clip_segment():
+    assert clip_segment(0.5, -1.0, 0.5, 2.0, BOX) == (1 / 3, 2 / 3)
+    assert clip_segment(0.2, 0.2, 0.8, 0.8, BOX) == (0.0, 1.0)
+    # Segment entièrement dehors, y compris parallèle à un bord
+    assert clip_segment(2.0, -1.0, 2.0, 2.0, BOX) is None
+    assert clip_segment(-1.0, 1.5, 0.5, 3.0, BOX) is None
+
+
+def test_crossing_between_sparse_fixes():
+    engine = GeofenceEngine(zones=ZONES)
+    assert engine.update("F1", 0.5, -1.0, at(0)) == []
+
+    # Les deux messages sont hors zone, mais le segment la traverse
+    events = engine.update("F1", 0.5, 2.0, at(30))
+    assert [(e.event, e.zone) for e in events] == [(ENTRY, "Test"), (EXIT, "Test")]
+    assert events[0].timestamp == at(10)
+    assert events[1].timestamp == at(20)
+    assert abs(events[0].longitude - 0.0) < 1e-9
+    assert abs(events[1].longitude - 1.0) < 1e-9
+    assert engine.inside["F1"] == set()
+
+
+def test_exit_then_reentry():
+    engine = GeofenceEngine(zones=ZONES)
+    positions = [(0.5, -0.5), (0.5, 0.5), (0.5, 1.5), (0.5, 0.5)]
+    events = []
+    for i, (lat, lon) in enumerate(positions):
+        events.extend(engine.update("F1", lat, lon, at(10 * i)))
+
+    assert [e.event for e in events] == [ENTRY, EXIT, ENTRY]
+    assert [e.timestamp for e in events] == [at(5), at(15), at(25)]
+    assert engine.inside["F1"] == {0}
+
+
+def test_long_gap_uses_membership_only():
+    engine = GeofenceEngine(zones=ZONES, max_gap_s=600)
+    engine.update("F1", 0.5, -1.0, at(0))
+    # Trou de 20 minutes : pas de trajectoire rectiligne supposée entre les deux messages
+    assert engine.update("F1", 0.5, 2.0, at(1200)) == []
+
+
+def test_expire():
+    engine = GeofenceEngine(zones=ZONES)
+    engine.update("F1", 0.5, 0.5, at(0))
+    engine.update("F2", 0.5, 0.5, at(900))
+    engine.expire(at(600))
+    assert set(engine.last_position) == {"F2"}
+    assert set(engine.inside) == {"F2"}
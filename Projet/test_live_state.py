@@ -0,0 +1,132 @@
+import pandas as pd
+from dash import no_update
+
+from live_state import LiveState, critical_row_key, make_critical_row, patch_critical_table
+
+T0 = pd.Timestamp("2025-12-05 14:00:00")
+
+
+def make_chunk(flight_ids, start_s, n=2, label="Normal", in_zone=0):
+    """Lot transformé : n points par vol, un par seconde à partir de T0 + start_s."""
+    return pd.DataFrame([
+        {"flight_id": fid, "callsign": f"CS{fid}", "latitude": 30.0, "longitude": -30.0,
+         "altitude": 30000 + i, "ground_speed": 450, "heading": 0, "autopilot_on": 1,
+         "deviation_m": 0.0, "in_restricted_zone": in_zone, "predicted_anomaly": label,
+         "timestamp": T0 + pd.Timedelta(seconds=start_s + i)}
+        for fid in flight_ids for i in range(n)
+    ])
+
+
+def apply_patch(rows, patch):
+    """Applique un Patch Dash sur une liste, comme le fait le navigateur."""
+    if patch is no_update:
+        return rows
+    rows = list(rows)
+    for op in patch.to_plotly_json()["operations"]:
+        if op["operation"] == "Append":
+            rows.append(op["params"]["value"])
+        elif op["operation"] == "Assign":
+            rows[op["location"][0]] = op["params"]["value"]
+        elif op["operation"] == "Delete":
+            del rows[op["location"][0]]
+        else:
+            raise AssertionError(op)
+    return rows
+
+
+def test_ingest_deltas():
+    state = LiveState()
+    state.reset(make_chunk(["A", "B"], 0))
+    base = state.base_version
+
+    v1 = state.ingest(make_chunk(["A"], 10))
+    v2 = state.ingest(make_chunk(["C"], 20))
+    assert (v1, v2) == (base + 1, base + 2)
+    assert not state.is_stale(base)
+
+    # Seuls les points arrivés dans l'intervalle de versions sont renvoyés
+    assert len(state.flight_points_since("A", base, until_version=v1)) == 2
+    assert state.flight_points_since("A", v1) is None
+    assert [o["value"] for o in state.flight_options(since_version=v1, until_version=v2)] == ["C"]
+    assert state.kpis()[0] == "3"
+
+
+def test_stale_after_journal_overflow():
+    state = LiveState(max_journal=3)
+    state.reset(make_chunk(["A"], 0))
+    base = state.base_version
+    for i in range(3):
+        state.ingest(make_chunk(["A"], 10 * (i + 1)))
+    assert not state.is_stale(base)
+
+    # Le journal a perdu la version base + 1 : le client doit repartir d'un état complet
+    state.ingest(make_chunk(["A"], 40))
+    assert state.is_stale(base)
+    assert not state.is_stale(state.version - 1)
+    assert state.is_stale(None)
+
+
+def test_expiry_bumps_base_version():
+    state = LiveState(window_s=3600, expire_every_s=300)
+    state.reset(make_chunk(["A", "B"], 0))
+    base = state.base_version
+
+    state.ingest(make_chunk(["C"], 2 * 3600))
+    assert state.base_version == state.version > base
+    assert state.is_stale(base)
+    assert [o["value"] for o in state.flight_options()] == ["C"]
+    assert len(state.snapshot()[1]) == 2
+
+
+def test_patch_critical_table():
+    state = LiveState()
+    state.reset(make_chunk(["A", "B"], 0, label="Holding"))
+    old_rows = state.critical_rows()
+    old_keys = [critical_row_key(row) for row in old_rows]
+    assert patch_critical_table(old_keys, old_rows) is no_update
+
+    # Nouveau vol critique en tête, B mis à jour, A sorti du top 2
+    state.ingest(make_chunk(["B"], 10, label="Holding"))
+    state.ingest(make_chunk(["C"], 20, label="Holding"))
+    new_rows = state.critical_rows(top=2)
+    assert apply_patch(old_rows, patch_critical_table(old_keys, new_rows)) == new_rows
+
+    # Lignes en moins
+    shorter = new_rows[:1]
+    new_keys = [critical_row_key(row) for row in new_rows]
+    assert apply_patch(new_rows, patch_critical_table(new_keys, shorter)) == shorter
+
+
+def test_critical_row_uses_flight_zone_status():
+    last = make_chunk(["A"], 0, n=1).iloc[0]
+    assert make_critical_row("A", last, True)["in_restricted_zone"] == 1
+
+
+def new_tab_flights(state, reset_df):
+    """Vols vus par un nouvel onglet : état initial de update_data, puis deltas de push_live_updates."""
+    if state.moved_past_reset():
+        version = state.version
+        options = state.flight_options(until_version=version)
+    else:
+        version = state.base_version
+        options = [{'value': fid} for fid in reset_df["flight_id"].unique()]
+    options += state.flight_options(since_version=version)
+    return sorted(o["value"] for o in options)
+
+
+def test_new_tab_after_expiry():
+    state = LiveState(window_s=3600, expire_every_s=300)
+    reset_df = make_chunk(["A", "B"], 0)
+    state.reset(reset_df)
+    state.ingest(make_chunk(["C"], 10))
+    assert not state.moved_past_reset()
+    assert new_tab_flights(state, reset_df) == ["A", "B", "C"]
+
+    # A et B expirent ; D apparaît dans le lot qui déclenche l'expiration (first_version == base_version)
+    state.ingest(make_chunk(["C", "D"], 2 * 3600))
+    assert state.moved_past_reset()
+    assert new_tab_flights(state, reset_df) == ["C", "D"]
+
+    # Un vol arrivé ensuite est poussé en delta
+    state.ingest(make_chunk(["E"], 2 * 3600 + 10))
+    assert new_tab_flights(state, reset_df) == ["C", "D", "E"]
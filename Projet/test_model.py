@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from model import FlightInferenceSession, FlightModel
+
+
+class CountingClassifier:
+    """Classifieur factice : toujours 'Normal' à 80 %, et compte les fenêtres scorées."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict_proba(self, features):
+        self.rows += len(features)
+        return np.tile([0.8, 0.2], (len(features), 1))
+
+
+class Encoder:
+    def inverse_transform(self, idx):
+        return np.array(["Normal", "Holding"])[idx]
+
+
+def make_model():
+    model = FlightModel(model_folder="inexistant")
+    model.model = CountingClassifier()
+    model.encoder = Encoder()
+    return model
+
+
+def make_flights(n_flights=3, n_points=45):
+    t0 = pd.Timestamp("2025-12-05 14:00:00")
+    rows = [
+        {"flight_id": f"F{f}", "timestamp": t0 + pd.Timedelta(seconds=i), "latitude": 45.0, "longitude": 1.0,
+         "altitude": 30000, "ground_speed": 450, "heading": 90, "autopilot_on": 1, "deviation_m": 0.0}
+        for i in range(n_points) for f in range(n_flights)
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_predict_flights_labels_and_cache():
+    model = make_model()
+    df = make_flights()
+
+    flights = model.predict_flights(df)
+    assert flights["predicted_anomaly"].tolist() == ["Normal"] * 3
+    assert np.allclose(flights["confidence"], 0.8)
+    assert flights["windows"].tolist() == [5, 5, 5]
+    assert model.model.rows == 15
+
+    # Rien n'a changé : aucune fenêtre rescorée
+    assert model.predict_flights(df)["scored"].sum() == 0
+    assert model.model.rows == 15
+
+
+def test_session_scores_each_window_once():
+    model = make_model()
+    session = FlightInferenceSession(model)
+    df = make_flights()
+
+    # Lots entrelacés de 2 points par vol : chaque fenêtre est d'abord vue incomplète
+    for start in range(0, len(df), 6):
+        flights = session.update(df.iloc[start:start + 6])
+        assert set(flights["predicted_anomaly"]) == {"Normal"}
+
+    # 4 fenêtres pleines par vol + la première fenêtre de chaque vol, scorée incomplète
+    assert model.model.rows == 3 * 4 + 3
+    # Le cache du modèle partagé avec le dashboard n'est pas touché
+    assert len(model.window_cache.entries) == 0
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from geofence import ENTRY, GeofenceEvent
+from replay import ReplayStore, state_critical_rows, state_kpis
+
+T0 = pd.Timestamp("2025-12-05 10:00:00")
+
+
+def at(seconds):
+    return T0 + pd.Timedelta(seconds=seconds)
+
+
+def make_points(flight_id, start_s, end_s, step_s=30):
+    return pd.DataFrame([
+        {"flight_id": flight_id, "callsign": "AFR123", "latitude": 45.0, "longitude": 1.0,
+         "altitude": 30000, "ground_speed": 450, "heading": 0, "in_restricted_zone": 0,
+         "predicted_anomaly": "Normal", "timestamp": at(s)}
+        for s in range(start_s, end_s, step_s)
+    ])
+
+
+def test_crossing_counted_from_entry_time():
+    store = ReplayStore()
+    entry = GeofenceEvent("F1", "Test", ENTRY, at(330), 45.0, 1.0)
+    store.append(make_points("F1", 0, 600), zone_events=[entry])
+
+    assert state_kpis(store.seek(at(90)))[2] == "0"
+    assert state_kpis(store.seek(at(400)))[2] == "1"
+
+
+def test_label_at_seek_time():
+    store = ReplayStore()
+    points = make_points("F1", 0, 600)
+    points.loc[points["timestamp"] >= at(300), "predicted_anomaly"] = "Holding"
+    store.append(points)
+
+    # Le vol est compté sous son libellé à l'instant rejoué, pas sous son premier libellé
+    assert state_kpis(store.seek(at(90)))[1] == "0"
+    assert state_kpis(store.seek(at(400)))[1] == "1"
+    assert state_critical_rows(store.seek(at(90))) == []
+    assert state_critical_rows(store.seek(at(400)))[0]["predicted_anomaly"] == "Holding"
+
+
+def test_state_restored_after_restart(tmp_path):
+    store = ReplayStore(directory=str(tmp_path))
+    store.append(make_points("F1", 0, 600))
+    store.flush()
+
+    restarted = ReplayStore(directory=str(tmp_path))
+    assert set(restarted.state) == {"F1"}
+
+    # La première minute écrite après le redémarrage contient encore l'avion actif
+    restarted.append(make_points("F2", 600, 700))
+    assert set(restarted.seek(at(661))) == {"F1", "F2"}
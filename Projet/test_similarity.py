@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from similarity import FlightTracker, TrajectoryIndex
+
+DIM = 8
+
+
+def make_vectors(n, seed=0):
+    """Vecteurs dans un sous-espace de dimension 3 : la PCA à 4 composantes conserve les distances."""
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(3, DIM))
+    return rng.normal(size=(n, 3)) @ basis
+
+
+def make_index(**kwargs):
+    kwargs.setdefault("n_components", 4)
+    kwargs.setdefault("min_rebuild", 1000)
+    return TrajectoryIndex(**kwargs)
+
+
+def brute_force(vectors, query, k):
+    distances = np.linalg.norm(vectors - query, axis=1)
+    return [f"F{row}" for row in np.argsort(distances)[:k]]
+
+
+def test_tree_and_pending_merged():
+    vectors = make_vectors(60)
+    index = make_index()
+    for row in range(40):
+        index.add(f"F{row}", vectors[row], "Normal")
+    index.build()
+    assert index.tree_rows == 40 and index.pca is not None
+
+    # 20 vols dans le tampon, projetés avec la PCA de l'arbre
+    for row in range(40, 60):
+        index.add(f"F{row}", vectors[row], "Normal")
+    assert len(index.pending) == 20
+
+    for query in make_vectors(5, seed=1):
+        results = index.query(query, k=5)
+        assert [fid for fid, _, _ in results] == brute_force(vectors, query, 5)
+        distances = [d for _, _, d in results]
+        assert distances == sorted(distances)
+
+
+def test_replaced_vector_filtered():
+    vectors = make_vectors(30)
+    index = make_index()
+    for row in range(30):
+        index.add(f"F{row}", vectors[row], "Normal")
+    index.build()
+
+    # F0 est remplacé par le vecteur de F1 : son ancienne ligne (dans l'arbre) ne doit plus sortir
+    index.add("F0", vectors[1], "Holding")
+    results = index.query(vectors[0], k=30)
+    assert len(results) == 30
+    assert [label for fid, label, _ in results if fid == "F0"] == ["Holding"]
+    assert len(index) == 30
+
+    # Après reconstruction, la ligne remplacée est oubliée
+    index.build()
+    assert index.tree_rows == 30 and not index.removed
+    assert index.query(vectors[1], k=2, exclude="F1")[0][:2] == ("F0", "Holding")
+
+
+def test_exclude():
+    vectors = make_vectors(20)
+    index = make_index()
+    for row in range(20):
+        index.add(f"F{row}", vectors[row], "Normal")
+    index.build()
+
+    results = index.query_flight("F3", k=5)
+    assert len(results) == 5
+    assert "F3" not in [fid for fid, _, _ in results]
+    assert [fid for fid, _, _ in results] == brute_force(vectors, vectors[3], 6)[1:]
+
+
+def test_rebuild_threshold():
+    vectors = make_vectors(20)
+    index = make_index(min_rebuild=5, rebuild_ratio=0.5)
+    for row in range(4):
+        index.add(f"F{row}", vectors[row], "Normal")
+    assert index.tree is None and len(index.pending) == 4
+
+    index.add("F4", vectors[4], "Normal")
+    assert index.tree_rows == 5 and not index.pending
+
+    # Seuil : max(min_rebuild, rebuild_ratio * tree_rows) = 5 vols en attente
+    for row in range(5, 9):
+        index.add(f"F{row}", vectors[row], "Normal")
+    assert index.tree_rows == 5 and len(index.pending) == 4
+    index.add("F9", vectors[9], "Normal")
+    assert index.tree_rows == 10 and not index.pending
+
+
+class ConcurrentIndex(TrajectoryIndex):
+    """Simule des ajouts arrivant pendant la construction de l'arbre (hors du verrou)."""
+
+    def __init__(self, during_build, **kwargs):
+        super().__init__(**kwargs)
+        self.during_build = during_build
+
+    def _fit(self, matrix):
+        during_build, self.during_build = self.during_build, []
+        for flight_id, vector in during_build:
+            self.add(flight_id, vector, "Pendant")
+        return super()._fit(matrix)
+
+
+def test_rows_added_during_rebuild_kept():
+    vectors = make_vectors(30)
+    # F2 remplacé et F25 ajouté pendant la construction
+    index = ConcurrentIndex([("F2", vectors[2]), ("F25", vectors[25])], n_components=4, min_rebuild=1000)
+    for row in range(20):
+        index.add(f"F{row}", vectors[row], "Normal")
+    index.add("F0", vectors[0], "Normal")
+    index.build()
+
+    assert index.tree_rows == 20
+    # L'ancienne ligne de F0 est compactée, celle de F2 (dans le nouvel arbre) est marquée remplacée
+    assert [index.ids[row] for row in index.removed] == ["F2"]
+    assert index.ids.count("F0") == 1
+    assert [index.ids[row] for row in index.pending] == ["F2", "F25"]
+    assert len(index) == 21
+
+    indexed = np.vstack([vectors[:20], vectors[25:26]])
+    results = index.query(vectors[2], k=21)
+    assert sorted(fid for fid, _, _ in results) == sorted(f"F{row}" for row in list(range(20)) + [25])
+    assert [label for fid, label, _ in results if fid == "F2"] == ["Pendant"]
+    assert results[0][0] == "F2"
+    assert np.isclose(results[1][2], np.sort(np.linalg.norm(indexed - vectors[2], axis=1))[1])
+
+
+def test_tracker_indexes_latest_label():
+    index = make_index()
+    tracker = FlightTracker(index, idle_s=60)
+    t0 = pd.Timestamp("2025-12-05 14:00:00")
+
+    def chunk(flight_id, start_s, label):
+        return pd.DataFrame([
+            {"flight_id": flight_id, "latitude": 45.0 + 0.01 * i, "longitude": 1.0, "altitude": 30000,
+             "ground_speed": 450, "heading": 0, "timestamp": t0 + pd.Timedelta(seconds=start_s + i),
+             "predicted_anomaly": label}
+            for i in range(5)
+        ])
+
+    tracker.update(chunk("F1", 0, "Normal"))
+    tracker.update(chunk("F1", 5, "Holding"))
+    assert tracker.update(chunk("F2", 120, "Normal")) == ["F1"]
+    assert index.labels[index.position["F1"]] == "Holding"
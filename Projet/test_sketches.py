@@ -0,0 +1,57 @@
+import random
+
+import pandas as pd
+
+from sketches import KLLSketch, StreamingStats
+
+N = 100000
+QS = [i / 20 for i in range(1, 20)]
+# Borne documentée : erreur de rang normalisée ~1.65/k pour k=200
+RANK_BOUND = 1.65 / 200
+
+
+def rank_error(sketch):
+    return max(abs(value / N - q) for value, q in zip(sketch.quantiles(QS), QS))
+
+
+def test_kll_rank_error_within_bound():
+    values = list(range(N))
+    random.Random(0).shuffle(values)
+    sketch = KLLSketch(seed=0)
+    for value in values:
+        sketch.update(value)
+
+    assert sketch.n == N
+    assert rank_error(sketch) <= RANK_BOUND
+    assert sketch.quantiles([0, 1]) == [0, N - 1]
+    # Mémoire fixe : au plus ~3k valeurs conservées
+    assert sketch._size() <= 3 * sketch.k
+
+
+def test_kll_merge_within_bound():
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    for value in range(N // 2):
+        left.update(value)
+    for value in range(N // 2, N):
+        right.update(value)
+
+    merged = left.merge(right)
+    assert merged.n == N
+    assert rank_error(merged) <= RANK_BOUND
+    assert merged.quantiles([0, 1]) == [0, N - 1]
+
+
+def test_streaming_stats_window():
+    stats = StreamingStats(window_s=600, bucket_s=60)
+    t0 = pd.Timestamp("2025-12-05 14:00:00")
+    stats.update("Holding", t0, 1000)
+    stats.update("Normal", t0 + pd.Timedelta(minutes=7), 30000)
+    assert set(stats.box_stats()) == {"Holding", "Normal"}
+
+    # 15 minutes plus tard, la tranche du message "Holding" est sortie de la fenêtre
+    stats.update("Normal", t0 + pd.Timedelta(minutes=15), 32000)
+    assert stats.box_stats() == {"Normal": [30000, 30000, 30000, 32000, 32000]}
+
+    # Message trop en retard : ignoré
+    stats.update("Holding", t0, 1000)
+    assert set(stats.box_stats()) == {"Normal"}
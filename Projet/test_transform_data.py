@@ -0,0 +1,42 @@
+import pandas as pd
+
+from live_state import LiveFeeder, LiveState
+from recuperation_donnees import SBS_COLUMNS
+from transform_data import transform_raw_data
+
+
+def make_raw(hex_ident, n, start="2025-12-05 14:00:00", lat0=45.0):
+    """Messages SBS-1 complets d'un avion qui monte vers le nord, un message par seconde."""
+    rows = []
+    for i in range(n):
+        ts = pd.Timestamp(start) + pd.Timedelta(seconds=i)
+        row = dict.fromkeys(SBS_COLUMNS, "")
+        row.update({
+            "MessageType": "MSG", "TransmissionType": "3", "HexIdent": hex_ident,
+            "DateGenerated": ts.strftime("%Y/%m/%d"), "TimeGenerated": ts.strftime("%H:%M:%S.%f")[:-3],
+            "Callsign": "AFR123", "Altitude": str(30000 + 10 * i), "GroundSpeed": "450", "Track": "0",
+            "Latitude": str(lat0 + 0.01 * i), "Longitude": "1.0",
+        })
+        rows.append(row)
+    return pd.DataFrame(rows, columns=SBS_COLUMNS)
+
+
+def test_single_flight_batch():
+    df = transform_raw_data(make_raw("ABC123", 5), verbose=False)
+    assert len(df) == 5
+    assert df["autopilot_on"].tolist() == [0, 1, 1, 1, 1]
+
+
+def test_live_features_use_flight_history():
+    feeder = LiveFeeder(LiveState())
+    raw = make_raw("ABC123", 20)
+
+    first = feeder._apply_flight_history(transform_raw_data(raw.iloc[:10], verbose=False).reset_index(drop=True))
+    second = feeder._apply_flight_history(transform_raw_data(raw.iloc[10:], verbose=False).reset_index(drop=True))
+
+    # Numérotation continue d'un lot à l'autre : seul le début du vol est hors pilote automatique
+    assert first["autopilot_on"].tolist() == [0] + [1] * 9
+    assert second["autopilot_on"].tolist() == [1] * 10
+    assert feeder.counters["ABC123"] == 20
+    # Route calculée sur le vol entier (départ, milieu, dernier point) et non sur le seul lot
+    assert second["deviation_m"].iloc[1] > 0
@@ -3,6 +3,20 @@ from geopy.distance import geodesic
 import os
 import sys
 
+# Liste des zones restreintes (Format: [Sud-Ouest, Nord-Ouest, Nord-Est, Sud-Est])
+RESTRICTED_ZONES = {
+    # Paris (Approximatif)
+    "Paris": [(48.5, 2.2), (48.9, 2.2), (48.9, 2.6), (48.5, 2.6)],
+    "BA 105 Évreux-Fauville": [(48.98, 1.15), (49.07, 1.15), (49.07, 1.29), (48.98, 1.29)],
+    "BA 118 Mont-de-Marsan": [(43.87, -0.55), (43.96, -0.55), (43.96, -0.45), (43.87, -0.45)],
+    "BA 113 Saint-Dizier-Robinson": [(48.59, 4.85), (48.68, 4.85), (48.68, 4.95), (48.59, 4.95)],
+    "BA 133 Nancy-Ochey": [(48.54, 5.90), (48.63, 5.90), (48.63, 6.02), (48.54, 6.02)],
+    "BA 123 Orléans-Bricy": [(47.95, 1.70), (48.04, 1.70), (48.04, 1.82), (47.95, 1.82)],
+    "BA 115 Orange-Caritat": [(44.10, 4.80), (44.19, 4.80), (44.19, 4.92), (44.10, 4.92)],
+    "BA 106 Bordeaux-Mérignac": [(44.79, -0.76), (44.87, -0.76), (44.87, -0.66), (44.79, -0.66)],
+    "BA 107 Vélizy-Villacoublay": [(48.75, 2.18), (48.80, 2.18), (48.80, 2.24), (48.75, 2.24)]
+}
+
 # --- Fonctions utilitaires ---
 
 def generate_polyline(flight_df):
@@ -54,29 +68,7 @@ def in_restricted(lat, lon):
     Vérifie si une coordonnée (lat, lon) se trouve dans une zone restreinte.
     Retourne 1 si dans une zone, 0 sinon.
     """
-    # Liste des zones restreintes (Format: [Sud-Ouest, Nord-Ouest, Nord-Est, Sud-Est])
-    zones = [
-        # Paris (Approximatif)
-        [(48.5, 2.2), (48.9, 2.2), (48.9, 2.6), (48.5, 2.6)],
-        # BA 105 Évreux-Fauville
-        [(48.98, 1.15), (49.07, 1.15), (49.07, 1.29), (48.98, 1.29)],
-        # BA 118 Mont-de-Marsan
-        [(43.87, -0.55), (43.96, -0.55), (43.96, -0.45), (43.87, -0.45)],
-        # BA 113 Saint-Dizier-Robinson
-        [(48.59, 4.85), (48.68, 4.85), (48.68, 4.95), (48.59, 4.95)],
-        # BA 133 Nancy-Ochey
-        [(48.54, 5.90), (48.63, 5.90), (48.63, 6.02), (48.54, 6.02)],
-        # BA 123 Orléans-Bricy
-        [(47.95, 1.70), (48.04, 1.70), (48.04, 1.82), (47.95, 1.82)],
-        # BA 115 Orange-Caritat
-        [(44.10, 4.80), (44.19, 4.80), (44.19, 4.92), (44.10, 4.92)],
-        # BA 106 Bordeaux-Mérignac
-        [(44.79, -0.76), (44.87, -0.76), (44.87, -0.66), (44.79, -0.66)],
-        # BA 107 Vélizy-Villacoublay
-        [(48.75, 2.18), (48.80, 2.18), (48.80, 2.24), (48.75, 2.24)]
-    ]
-
-    for zone in zones:
+    for zone in RESTRICTED_ZONES.values():
         # On extrait les min/max du rectangle
         lat_min = zone[0][0]
         lat_max = zone[1][0]
@@ -88,23 +80,18 @@ def in_restricted(lat, lon):
             
     return 0 # False
 
-def process_flight_data(input_csv_path="test_data_dashboard.csv", output_csv_path="test_data_transformed.csv"):
-    #print(f"--- Mode Qualité Stricte ---")
-    #print(f"Lecture : {input_csv_path}")
-    
-    if not os.path.exists(input_csv_path):
-        print(f"Erreur : Fichier introuvable.")
-        return
-
-    try:
-        df_raw = pd.read_csv(input_csv_path)
-    except pd.errors.EmptyDataError:
-        print("Erreur : Fichier vide.")
-        return
-
+def transform_raw_data(df_raw, verbose=True):
+    """
+    Applique le pipeline de transformation sur un DataFrame brut (colonnes SBS-1).
+    Retourne le DataFrame transformé, ou None si aucune ligne n'est exploitable.
+    Utilisé par process_flight_data (fichier complet) et par le mode live (par lots).
+    Route prévue, déviation et pilote automatique sont calculés sur les seuls points reçus :
+    en mode live, LiveFeeder les recalcule avec l'historique de chaque vol.
+    """
     if df_raw.empty:
-        print("Erreur : Aucune donnée.")
-        return
+        return None
+
+    df_raw = df_raw.copy()
 
     # 1. Parsing & Tri
     df_raw["ts_temp"] = pd.to_datetime(
@@ -149,14 +136,14 @@ def process_flight_data(input_csv_path="test_data_dashboard.csv", output_csv_pat
     """
 
     if df.empty:
-        print("STOP : Le filtrage strict a supprimé toutes les données.")
-        return
+        return None
 
     # Ajout colonne technique (non soumise au dropna car créée après)
     df["anomaly_type"] = "Normal"
 
     # 5. Calculs Métier (Sur données propres uniquement)
-    print("Génération des métriques...")
+    if verbose:
+        print("Génération des métriques...")
     
     routes = df.groupby("flight_id", group_keys=False).apply(generate_polyline, include_groups=False).reset_index()
     routes.columns = ["flight_id", "intended_route_polyline"]
@@ -165,13 +152,14 @@ def process_flight_data(input_csv_path="test_data_dashboard.csv", output_csv_pat
     df["route_points"] = df["intended_route_polyline"].apply(decode_polyline)
     df["deviation_m"] = df.apply(compute_deviation, axis=1)
 
-    df["autopilot_on"] = df.groupby("flight_id", group_keys=False).apply(
-        lambda g: pd.Series(generate_autopilot(g), index=g.index),
-        include_groups=False
-    ).reset_index(level=0, drop=True)
+    # transform (et non apply) : reste correct quand le lot ne contient qu'un seul vol
+    df["autopilot_on"] = df.groupby("flight_id")["anomaly_type"].transform(
+        lambda g: generate_autopilot(g.to_frame())
+    )
 
     # 6. Détection Zones Restreintes
-    print("Vérification des zones restreintes...")
+    if verbose:
+        print("Vérification des zones restreintes...")
     df["in_restricted_zone"] = df.apply(
         lambda row: in_restricted(row["latitude"], row["longitude"]), axis=1
     )
@@ -185,7 +173,30 @@ def process_flight_data(input_csv_path="test_data_dashboard.csv", output_csv_pat
         "anomaly_type", "timestamp"
     ]
     
-    df_final = df[target_columns]
+    return df[target_columns]
+
+def process_flight_data(input_csv_path="test_data_dashboard.csv", output_csv_path="test_data_transformed.csv"):
+    #print(f"--- Mode Qualité Stricte ---")
+    #print(f"Lecture : {input_csv_path}")
+    
+    if not os.path.exists(input_csv_path):
+        print(f"Erreur : Fichier introuvable.")
+        return
+
+    try:
+        df_raw = pd.read_csv(input_csv_path)
+    except pd.errors.EmptyDataError:
+        print("Erreur : Fichier vide.")
+        return
+
+    if df_raw.empty:
+        print("Erreur : Aucune donnée.")
+        return
+
+    df_final = transform_raw_data(df_raw)
+    if df_final is None:
+        print("STOP : Le filtrage strict a supprimé toutes les données.")
+        return
     
     df_final.to_csv(output_csv_path, index=False)
     #print(f"Terminé : {output_csv_path}")